@@ -0,0 +1,87 @@
+"""
+Benchmark of the event link harvesting of BandsintownConnector.scrape_artist.
+
+Compares the old per-anchor loop (two get_attribute calls per <a>) with
+the single in-page harvest on a saved artist page, or on a synthetic one
+if no file is given.
+
+Usage (from the repository root):
+	python -m bandsintown_scraper.benchmark [saved_artist_page.html] [--runs N]
+"""
+
+import argparse
+import asyncio
+import time
+from urllib.parse import urlparse
+from modules.browser_pool import BrowserPool
+from bandsintown_scraper.modules.bandsintown_connector import HARVEST_LINKS_SCRIPT, event_links
+
+ARTIST_URL = "https://www.bandsintown.com/a/3959010"
+
+def synthetic_page(events: int = 300, other_links: int = 1_500) -> str:
+	"""
+	Artist-like page where every event is linked a few times
+	between a lot of unrelated anchors.
+	"""
+	anchors = []
+	for i in range(events):
+		for source in ("card", "image", "tickets"):
+			anchors.append(f'<a href="/e/{100000000 + i}-artist-at-venue-{i}?came_from=253&utm_source={source}">Event {i}</a>')
+	anchors += [f'<a href="/a/{i}-other-artist">Artist {i}</a>' for i in range(other_links)]
+	return f"<html><body><h1>Artist</h1>{''.join(anchors)}</body></html>"
+
+async def per_anchor(page):
+	"""
+	The previous implementation of scrape_artist's link loop.
+	"""
+	data = []
+	links = await page.locator('a').all()
+	link_list = []
+	link_del = set()
+
+	for link in links:
+		url = await link.get_attribute('href')
+		href = await link.get_attribute('href')
+		if href:
+			href = urlparse(href)
+			path = href.path.split("/")
+			if len(path) > 1:
+				if path[1] == 'e':
+					link_del.add(path[2])
+					if len(link_list) != len(link_del):
+						link_list.append(url)
+						data.append(url.split('?')[0])
+	return data
+
+async def bulk(page):
+	hrefs = await page.eval_on_selector_all("a[href*='/e/']", HARVEST_LINKS_SCRIPT)
+	return event_links(hrefs, ARTIST_URL)
+
+async def main(html: str, runs: int):
+	async with BrowserPool(size=1, pages_per_browser=1) as pool:
+		async with pool.page() as page:
+			await page.route("**/*", lambda route: route.abort())
+			await page.set_content(html)
+			anchors = await page.locator('a').count()
+
+			for name, harvest in (("per-anchor", per_anchor), ("bulk", bulk)):
+				timings = []
+				for _ in range(runs):
+					start = time.perf_counter()
+					links = await harvest(page)
+					timings.append(time.perf_counter() - start)
+				print(f"{name:>10}: {len(links)} links from {anchors} anchors, best of {runs}: {min(timings) * 1000:.1f}ms")
+
+if __name__ == "__main__":
+	parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+	parser.add_argument("page", nargs="?", help="Saved artist page (HTML); a synthetic page is used if omitted")
+	parser.add_argument("--runs", type=int, default=5)
+	args = parser.parse_args()
+
+	if args.page:
+		with open(args.page, encoding="utf-8") as f:
+			html = f.read()
+	else:
+		html = synthetic_page()
+
+	asyncio.run(main(html, args.runs))
@@ -2,20 +2,90 @@
 Logics regarding scraping data from bandsintown.com.
 """
 
+import asyncio
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urljoin, urlparse
+import requests
+from modules.adaptive_throttle import AdaptiveThrottle
+from modules.browser_pool import BrowserPool
+from modules.custom_fetcher import AsyncCustomFetcher, CircuitOpenError, RobotsError
 from modules.custom_logger import CustomLogger
-from urllib.parse import urlparse
-from playwright.async_api import async_playwright
-from urllib.parse import urlparse
-from modules.custom_logger import CustomLogger
-from playwright.sync_api import sync_playwright
+from modules.html_extractor import PageData, extract
+from modules.request_blocker import RequestBlocker
+
+BASE_URL = "https://www.bandsintown.com"
+
+# Elements read from event and venue pages
+VENUE_NAME = "i5s97858a8YcXS8Ht2a4"
+VENUE_EVENT_LINK = "tY_uoLiOK4FrxkcoAV7k"
+EVENT_NAME = "_FmG2rq5Aj0u3WF5Nunp"
+EVENT_PLACE_LINK = "cmjTos0Zxfv6k1J2SE4c"
+
+# Resolved hrefs of all matched anchors in a single round-trip.
+HARVEST_LINKS_SCRIPT = "anchors => anchors.map(anchor => anchor.href)"
+
+def event_links(hrefs: Iterable[Optional[str]], base_url: str = BASE_URL) -> List[str]:
+	"""
+	Canonical event page URLs (/e/<id>-<slug>) of hrefs, without query
+	and fragment, deduplicated by event id in order of appearance.
+	"""
+	links = {}
+	for href in hrefs:
+		if not href:
+			continue
+		parsed = urlparse(urljoin(base_url, href))
+		path = parsed.path.split("/")
+		if len(path) < 3 or path[1] != "e" or not path[2]:
+			continue
+		event_id = path[2].split("-")[0]
+		if event_id not in links:
+			links[event_id] = parsed._replace(
+				scheme=parsed.scheme.lower(),
+				netloc=parsed.netloc.lower(),
+				query="",
+				fragment="",
+			).geturl()
+	return list(links.values())
 
 class BandsintownConnector:
 	"""
-	Connector class to get data from scraping 
+	Connector class to get data from scraping
 	"""
-	def __init__(self):
+	def __init__(
+		self,
+		headless=True,
+		pool: Optional[BrowserPool] = None,
+		blocker: Optional[RequestBlocker] = None,
+		fetcher: Optional[AsyncCustomFetcher] = None,
+		http_first=True,
+		throttle: Optional[AdaptiveThrottle] = None,
+	):
+		"""
+		pool: shared BrowserPool, a private one is made if not given.
+		blocker: request filter, by default images, media, fonts,
+		         stylesheets and trackers are not loaded, which also
+		         lets 'networkidle' settle much sooner.
+		fetcher: used for the HTTP-first path, a private one is made if not given.
+		http_first: try to read event and venue pages from their HTML
+		            before rendering them; Playwright is only used when
+		            a required field is missing.
+		throttle: adaptive per-origin pace of the browser and HTTP paths,
+		          shared with the private fetcher (pass the same one to
+		          a given fetcher); a private one is made if not given.
+		"""
 		self.logger = CustomLogger("BandsintownConnector")
-	def __call__(self, url: str):
+		self.blocker = blocker if blocker is not None else RequestBlocker()
+		self.pool = pool if pool is not None else BrowserPool(size=1, headless=headless)
+		self._owns_pool = pool is None
+		self.http_first = http_first
+		self.throttle = throttle if throttle is not None else AdaptiveThrottle()
+		self.fetcher = fetcher if fetcher is not None else AsyncCustomFetcher(throttle=self.throttle)
+		self._owns_fetcher = fetcher is None
+		# Pages served by each path ("http" or "browser")
+		self.path_hits = Counter()
+
+	async def __call__(self, url: str):
 		"""
 		Function to handle url based scraping.
 		"""
@@ -25,50 +95,134 @@ class BandsintownConnector:
 		path = parsed_url.path.split("/")
 
 		match path[1]:
-			case "e": 
+			case "e":
 				self.logger.info("Using event scraping method.")
-				return  self.scrape_event(parsed_url._replace(fragment="").geturl())
-			case "v": 
+				return await self.scrape_event(parsed_url._replace(fragment="").geturl())
+			case "v":
 				self.logger.info("Using event scraping method.")
-				return  self.scrape_event(parsed_url._replace(fragment="").geturl())
-			case "a": 
+				return await self.scrape_event(parsed_url._replace(fragment="").geturl())
+			case "a":
 				self.logger.info("Using artist scraping method.")
-				return  self.scrape_artist(parsed_url._replace(fragment="").geturl())
-			
-	def scrape_event(self, url: str):
+				return await self.scrape_artist(parsed_url._replace(fragment="").geturl())
+
+	async def close(self):
+		"""
+		Close the browser pool and the fetcher if this connector made them.
+		"""
+		self.logger.info(f"Scraping paths: {self.path_stats()}")
+		self.logger.info(f"Throttle limits: {self.throttle.snapshot()}")
+		if self._owns_pool:
+			await self.pool.close()
+		if self._owns_fetcher:
+			self.fetcher.close()
+
+	def path_stats(self) -> Dict[str, float]:
+		"""
+		Pages served over plain HTTP and by the browser, with the HTTP hit rate.
+		"""
+		total = self.path_hits["http"] + self.path_hits["browser"]
+		return {
+			"http": self.path_hits["http"],
+			"browser": self.path_hits["browser"],
+			"http_rate": self.path_hits["http"] / total if total else 0.0,
+		}
+
+	async def scrape_event(self, url: str):
 		"""
 		Function to scrape data from the event page.
 		"""
+		if self.http_first:
+			data = await self._scrape_event_http(url)
+			if data:
+				self.path_hits["http"] += 1
+				return data
+		self.path_hits["browser"] += 1
+		return await self._scrape_event_browser(url)
+
+	async def _scrape_event_http(self, url: str):
+		"""
+		Read the event or venue page from its server-rendered HTML.
+		Returns [] if the page has to be rendered.
+		"""
+		try:
+			response = await self.fetcher.fetch(url)
+			response.raise_for_status()
+		except (requests.RequestException, RobotsError, CircuitOpenError) as error:
+			self.logger.debug(f"HTTP path failed for {url}: {error}")
+			return []
+		page = extract(response.text, classes={VENUE_NAME, VENUE_EVENT_LINK, EVENT_NAME, EVENT_PLACE_LINK})
+		data = self._event_from_html(page, url)
+		if not data:
+			self.logger.debug(f"Required fields missing from the HTML of {url}.")
+		return data
 
+	def _event_from_html(self, page: PageData, url: str):
+		"""
+		Same fields as the browser path, from the rendered markup or else
+		from the MusicEvent JSON-LD. A venue needs its name and at least
+		one upcoming event link.
+		"""
+		place_name = page.texts(class_name=VENUE_NAME)
+		if place_name:
+			links = event_links((e.attrs.get("href") for e in page.find(class_name=VENUE_EVENT_LINK)), url)
+			if not links:
+				return []
+			return [{
+				"Place name":           place_name[0],
+				"bandsintown_url":      url
+			}] + links
+
+		name = page.texts(class_name=EVENT_NAME)
+		place_url = [e.attrs["href"] for e in page.find(class_name=EVENT_PLACE_LINK) if e.attrs.get("href")]
+		name = name[0] if name else None
+		place_url = place_url[0] if place_url else None
+
+		for item in page.json_ld_of_type("MusicEvent", "Event"):
+			location = item.get("location")
+			if isinstance(location, list):
+				location = location[0] if location else None
+			if not name:
+				name = item.get("name")
+			if not place_url and isinstance(location, dict):
+				for key in ("url", "sameAs", "@id"):
+					candidate = location.get(key)
+					if isinstance(candidate, str) and "/v/" in candidate:
+						place_url = candidate
+						break
+
+		if not (name and place_url):
+			return []
+		return [{
+			"Event name":           name,
+			"Place url":            urljoin(url, place_url.split("?")[0]),
+			"Bandsintown url":      url
+		}]
+
+	async def _scrape_event_browser(self, url: str):
 		data = []
-		with sync_playwright() as p:
-			browser =  p.chromium.launch(headless=True)
-			page =  browser.new_page()
-			page.goto(url, wait_until='networkidle')
-			
-			place_name = page.query_selector('.i5s97858a8YcXS8Ht2a4')
+		async with self.throttle.track(url), self.pool.page(blocker=self.blocker) as page:
+			await page.goto(url, wait_until='networkidle')
+
+			place_name = await page.query_selector('.i5s97858a8YcXS8Ht2a4')
 			if place_name:
-				place_name = page.locator('.i5s97858a8YcXS8Ht2a4').inner_text()
+				place_name = await page.locator('.i5s97858a8YcXS8Ht2a4').inner_text()
 				events = [{
 					"Place name":           place_name,
-					"bandsintown_url":      url 
+					"bandsintown_url":      url
 				}]
 
 				# locating upcoming concerts
-				links = page.locator('.tY_uoLiOK4FrxkcoAV7k').all()
-				for link in links:
-					link = link.get_attribute('href')
-					event_url = link.split("?")[0]
-					events.append(event_url)
+				hrefs = await page.eval_on_selector_all('.tY_uoLiOK4FrxkcoAV7k', HARVEST_LINKS_SCRIPT)
+				events.extend(event_links(hrefs, url))
 				return events
-			
-			# locating event name			
-			page.wait_for_selector('._FmG2rq5Aj0u3WF5Nunp')
-			name =  page.locator('._FmG2rq5Aj0u3WF5Nunp').inner_text()
+
+			# locating event name
+			await page.wait_for_selector('._FmG2rq5Aj0u3WF5Nunp')
+			name = await page.locator('._FmG2rq5Aj0u3WF5Nunp').inner_text()
 
 			# locating bandsintown_url of the place
-			page.wait_for_selector('.cmjTos0Zxfv6k1J2SE4c')
-			place_url =  page.locator('.cmjTos0Zxfv6k1J2SE4c').get_attribute('href')
+			await page.wait_for_selector('.cmjTos0Zxfv6k1J2SE4c')
+			place_url = await page.locator('.cmjTos0Zxfv6k1J2SE4c').get_attribute('href')
 			place_url = place_url.split("?")[0]
 
 			data.append({
@@ -78,48 +232,36 @@ class BandsintownConnector:
 			})
 		return data
 
-	def scrape_artist(self, url: str):
+	async def scrape_artist(self, url: str):
 		"""
 		Function to scrape data from the artist page.
 		"""
 		data = []
-		with sync_playwright() as p:
-			browser = p.chromium.launch(headless=True)
-			page = browser.new_page()
-			page.goto(url, wait_until='networkidle')
-		
+		async with self.throttle.track(url), self.pool.page(blocker=self.blocker) as page:
+			await page.goto(url, wait_until='networkidle')
+
 			# locating artist name
-			page.wait_for_selector('h1')
-			artist_name = page.locator('h1').inner_text()
+			await page.wait_for_selector('h1')
+			artist_name = await page.locator('h1').inner_text()
 			data.append({
 				"Artist name":      artist_name,
 				"Artist link":      url,
 			})
 
-			links = page.locator('a').all()
-			link_list = []
-			link_del = set()
-			
-			for link in links:
-				url = link.get_attribute('href')
-				href = link.get_attribute('href')
-				if href:
-					href = urlparse(href)
-					path = href.path.split("/")
-					if len(path) > 1:
-						if path[1] == 'e':
-							link_del.add(path[2])
-							if len(link_list) != len(link_del):
-								link_list.append(url)
-								data.append(url.split('?')[0])
+			# locating event links, all anchors resolved in one evaluation
+			hrefs = await page.eval_on_selector_all("a[href*='/e/']", HARVEST_LINKS_SCRIPT)
+			data.extend(event_links(hrefs, url))
 		return data
 
 if __name__ == "__main__":
-	logger = CustomLogger("Example")
-	connector = BandsintownConnector()
-	url = 'https://www.bandsintown.com/a/3959010'
-	    # 'https://www.bandsintown.com/e/106959093-blahalouisiana-at-budapest-park'
-	    # 'https://www.bandsintown.com/v/10121097-budapest-park'
-	data =  connector(url)
-	logger.info(data)
+	async def main():
+		logger = CustomLogger("Example")
+		connector = BandsintownConnector()
+		url = 'https://www.bandsintown.com/a/3959010'
+		    # 'https://www.bandsintown.com/e/106959093-blahalouisiana-at-budapest-park'
+		    # 'https://www.bandsintown.com/v/10121097-budapest-park'
+		data = await connector(url)
+		logger.info(data)
+		await connector.close()
 
+	asyncio.run(main())
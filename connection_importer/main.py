@@ -3,10 +3,16 @@ from croniter import croniter
 from datetime import datetime
 from os import getenv
 import asyncio
+import time
 import traceback
-from modules.db import connect_to_db
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+from modules.db import ConnectionPool, row_version, xmin_horizon
 
-def connectionImporter() -> None:
+def db_configs() -> tuple[dict, dict]:
+	"""
+	Connection settings of the main and the project database.
+	"""
 	MAIN_DB_CONFIG = {
         "dbname": getenv("POSTGRES_DB", "mock"),
         "user": getenv("POSTGRES_USER", "user"),
@@ -22,46 +28,211 @@ def connectionImporter() -> None:
         "host": getenv("POSTGRES_HOST", "localhost"),
         "port": getenv("POSTGRES_PORT", 5432),
     }
+	return MAIN_DB_CONFIG, PROJECT_DB_CONFIG
 
-	main_conn = connect_to_db(**MAIN_DB_CONFIG)
-	main_cursor = main_conn.cursor()
-	logger.info("Connected to the main database.")
-
-	# Get connections from main db.
-	sql = '''
-	SELECT 
-		  url.artist_id
-		, url.event_id
-		, url.subevent_id
-		, url.place_id
-		, url.tixa_url
-		, url.ticket_url
-		, url.bandsintown_url
-		, place.openstreetmap_id
-	FROM urls url
-	LEFT JOIN places place on url.place_id = place.id
-	WHERE 
-		url.tixa_url IS NOT NULL or 
-		url.ticket_url IS NOT NULL or 
-		url.bandsintown_url IS NOT NULL
-	;
-	'''
-
-	proj_conn = connect_to_db(**PROJECT_DB_CONFIG)
-	proj_cursor = proj_conn.cursor()
-	logger.info("Connected to the project's database.")
-
-	# Load connections into the project's db.
-	try:
-		# Run sql (31. row) save it to a variable
-		# Generate upload sql based on the values from it
-		# Run upload sql
-		pass
-	except Exception as e:
-		pass
-	finally:
-		pass
-	
+def changed_rows_query(watermark_column: str | None, since, by_ids: bool = False) -> sql.Composable:
+	"""
+	urls rows (with their place's openstreetmap_id) changed after the
+	watermark since, or all of them if since is None; with by_ids, the
+	ones whose id is in %(ids)s instead.
+
+	In xmin mode the WHERE cannot use an index, so finding the changed
+	rows is still a scan of urls joined to places.
+	"""
+	query = sql.SQL("""
+		SELECT
+			  url.id
+			, url.artist_id
+			, url.event_id
+			, url.subevent_id
+			, url.place_id
+			, url.tixa_url
+			, url.ticket_url
+			, url.bandsintown_url
+			, place.openstreetmap_id
+			, GREATEST({url_version}, {place_version})
+		FROM urls url
+		LEFT JOIN places place on url.place_id = place.id
+	""").format(url_version=row_version("url", watermark_column), place_version=row_version("place", watermark_column))
+	if by_ids:
+		query += sql.SQL("""
+		WHERE url.id = ANY(%(ids)s)
+		""")
+	elif since is not None:
+		query += sql.SQL("""
+		WHERE {url_version} > %(since)s OR {place_version} > %(since)s
+		""").format(url_version=row_version("url", watermark_column), place_version=row_version("place", watermark_column))
+	return query
+
+LINKED_URLS_FILTER = """
+	url.tixa_url IS NOT NULL or
+	url.ticket_url IS NOT NULL or
+	url.bandsintown_url IS NOT NULL
+"""
+
+UPSERT_SQL = """
+	INSERT INTO connections (
+		url_id, artist_id, event_id, subevent_id, place_id,
+		tixa_url, ticketswap_url, bandsintown_url, openstreetmap_id
+	)
+	VALUES %s
+	ON CONFLICT (url_id) DO UPDATE SET
+		  artist_id = EXCLUDED.artist_id
+		, event_id = EXCLUDED.event_id
+		, subevent_id = EXCLUDED.subevent_id
+		, place_id = EXCLUDED.place_id
+		, tixa_url = EXCLUDED.tixa_url
+		, ticketswap_url = EXCLUDED.ticketswap_url
+		, bandsintown_url = EXCLUDED.bandsintown_url
+		, openstreetmap_id = EXCLUDED.openstreetmap_id
+	WHERE (
+		connections.artist_id, connections.event_id, connections.subevent_id, connections.place_id,
+		connections.tixa_url, connections.ticketswap_url, connections.bandsintown_url, connections.openstreetmap_id
+	) IS DISTINCT FROM (
+		EXCLUDED.artist_id, EXCLUDED.event_id, EXCLUDED.subevent_id, EXCLUDED.place_id,
+		EXCLUDED.tixa_url, EXCLUDED.ticketswap_url, EXCLUDED.bandsintown_url, EXCLUDED.openstreetmap_id
+	)
+	RETURNING (xmax = 0)
+"""
+
+SAVE_STATE_SQL = """
+	INSERT INTO sync_state (name, watermark, synced_at, scanned, inserted, updated, deleted)
+	VALUES (%(name)s, %(watermark)s, current_timestamp, %(scanned)s, %(inserted)s, %(updated)s, %(deleted)s)
+	ON CONFLICT (name) DO UPDATE SET
+		  watermark = EXCLUDED.watermark
+		, synced_at = EXCLUDED.synced_at
+		, scanned = EXCLUDED.scanned
+		, inserted = EXCLUDED.inserted
+		, updated = EXCLUDED.updated
+		, deleted = EXCLUDED.deleted
+"""
+
+# Name of this sync in sync_state
+SYNC_NAME = "connections"
+
+# Rows fetched from the main db and upserted per round-trip
+BATCH_SIZE = 1000
+
+def connectionImporter(
+	main_pool: ConnectionPool,
+	proj_pool: ConnectionPool,
+	watermark_column: str | None = None,
+	batch_size: int = BATCH_SIZE,
+) -> dict:
+	"""
+	Copy the urls rows changed since the last run from the main db into the
+	project's connections table (keyed by url_id) and drop the ones deleted
+	or left without any platform URL.
+
+	The watermark is the largest row version seen: xmin of urls/places by
+	default, or watermark_column (a timestamp present on both, e.g.
+	updated_at). It is stored in sync_state together with the run's
+	statistics, in the same transaction as the changes. Without a stored
+	watermark every row is copied.
+
+	Only the changed rows are copied, but finding them in xmin mode and
+	finding deletions by id (see _reconcile) still read urls in full.
+
+	Returns the run's statistics.
+	"""
+	logger = CustomLogger("ConnectionImporter")
+	start = time.perf_counter()
+	stats = {"scanned": 0, "inserted": 0, "updated": 0, "deleted": 0}
+
+	with main_pool.connection() as main_conn, proj_pool.connection() as proj_conn:
+		proj_cursor = proj_conn.cursor()
+		proj_cursor.execute("SELECT watermark FROM sync_state WHERE name = %s", (SYNC_NAME,))
+		state = proj_cursor.fetchone()
+		since = state[0] if state else None
+
+		main_cursor = main_conn.cursor()
+		if watermark_column is None:
+			horizon = xmin_horizon(main_cursor)
+			if since is not None and int(since) > horizon:
+				logger.warning("Transaction ids wrapped around since the last sync; copying every row.")
+				since = None
+		logger.info(f"Syncing connections changed after {since}." if since is not None else "Syncing every connection.")
+
+		# Server-side cursor: only batch_size rows are held at a time.
+		changed = main_conn.cursor(name="connection_sync")
+		changed.itersize = batch_size
+		changed.execute(changed_rows_query(watermark_column, since), {"since": since})
+
+		# Largest row version read; every row read is newer than since.
+		latest = None
+		while True:
+			rows = changed.fetchmany(batch_size)
+			if not rows:
+				break
+			versions = [row[9] for row in rows if row[9] is not None]
+			if versions and (latest is None or max(versions) > latest):
+				latest = max(versions)
+			_apply(proj_cursor, rows, stats)
+		changed.close()
+
+		_reconcile(main_cursor, proj_cursor, watermark_column, stats)
+
+		watermark = latest if latest is not None else since
+		if watermark_column is None and watermark is not None:
+			watermark = min(int(watermark), horizon)
+		proj_cursor.execute(SAVE_STATE_SQL, {
+			"name": SYNC_NAME,
+			"watermark": str(watermark) if watermark is not None else None,
+			**stats,
+		})
+
+	elapsed = time.perf_counter() - start
+	logger.info(
+		f"Synced connections in {elapsed:.2f}s: {stats['scanned']} scanned, {stats['inserted']} inserted, "
+		f"{stats['updated']} updated, {stats['deleted']} deleted."
+	)
+	return stats
+
+def _apply(proj_cursor, rows: list, stats: dict) -> None:
+	"""
+	Upsert the rows of changed_rows_query into connections; the ones left
+	without any platform URL are deleted instead.
+	"""
+	stats["scanned"] += len(rows)
+	upserts, unlinked = [], []
+	for row in rows:
+		url_id, tixa_url, ticket_url, bandsintown_url = row[0], row[5], row[6], row[7]
+		if tixa_url is None and ticket_url is None and bandsintown_url is None:
+			unlinked.append(url_id)
+		else:
+			upserts.append(row[:9])
+
+	if upserts:
+		results = execute_values(proj_cursor, UPSERT_SQL, upserts, page_size=len(upserts), fetch=True)
+		inserted = sum(1 for (is_insert,) in results if is_insert)
+		stats["inserted"] += inserted
+		stats["updated"] += len(results) - inserted
+	if unlinked:
+		proj_cursor.execute("DELETE FROM connections WHERE url_id = ANY(%s)", (unlinked,))
+		stats["deleted"] += proj_cursor.rowcount
+
+def _reconcile(main_cursor, proj_cursor, watermark_column: str | None, stats: dict) -> None:
+	"""
+	Compare the ids of the linked urls rows with the url_ids of
+	connections: delete the connections whose urls row is gone (deletions
+	leave no row version behind) and copy the linked rows missing from
+	connections. Only ids are transferred, but both sides are read in
+	full, so this part of the run grows with the table size.
+	"""
+	main_cursor.execute(f"SELECT url.id FROM urls url WHERE {LINKED_URLS_FILTER}")
+	linked = {id for id, in main_cursor.fetchall()}
+	proj_cursor.execute("SELECT url_id FROM connections WHERE url_id IS NOT NULL")
+	copied = {id for id, in proj_cursor.fetchall()}
+
+	removed = copied - linked
+	if removed:
+		proj_cursor.execute("DELETE FROM connections WHERE url_id = ANY(%s)", (list(removed),))
+		stats["deleted"] += proj_cursor.rowcount
+
+	missing = linked - copied
+	if missing:
+		main_cursor.execute(changed_rows_query(watermark_column, None, by_ids=True), {"ids": list(missing)})
+		_apply(proj_cursor, main_cursor.fetchall(), stats)
 
 async def scheduler(function, cron_expression: str = "0 */6 * * *"):
 	"""
@@ -113,6 +284,17 @@ if __name__ == "__main__":
 
 	cron_expression = getenv("CONNECTION_IMPORTER_SCHEDULE", "0 */6 * * *")
 
-	scheduler(connectionImporter, cron_expression=cron_expression)
+	# The pools outlive the runs, so every run reuses their connections.
+	MAIN_DB_CONFIG, PROJECT_DB_CONFIG = db_configs()
+	main_pool = ConnectionPool(**MAIN_DB_CONFIG, minconn=1, maxconn=1)
+	proj_pool = ConnectionPool(**PROJECT_DB_CONFIG, minconn=1, maxconn=1)
+
+	# Timestamp column on urls and places used as watermark (default: xmin)
+	watermark_column = getenv("CONNECTION_IMPORTER_WATERMARK_COLUMN") or None
+
+	asyncio.run(scheduler(
+		lambda: connectionImporter(main_pool, proj_pool, watermark_column),
+		cron_expression=cron_expression,
+	))
 
 	logger.info("Exiting...")
\ No newline at end of file
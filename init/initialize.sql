@@ -49,4 +49,43 @@ CREATE TABLE IF NOT EXISTS scrapes (
     , timestamp timestamp NOT NULL
         DEFAULT current_timestamp
     , content JSONB
-);
\ No newline at end of file
+);
+
+CREATE TABLE IF NOT EXISTS robots_cache (
+	  origin varchar(2000) PRIMARY KEY
+    , user_agent varchar(256) NOT NULL
+    , content text NOT NULL
+    , min_delay double precision NOT NULL
+        CHECK (min_delay >= 0)
+    , fetched_at timestamptz NOT NULL
+        DEFAULT current_timestamp
+);
+
+CREATE TABLE IF NOT EXISTS rate_limits (
+	  origin varchar(2000) PRIMARY KEY
+    , last_request_at timestamptz NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS import_progress (
+	  batch int NOT NULL
+    , filename varchar(256) NOT NULL
+    , rows bigint NOT NULL
+    , finished_at timestamptz NOT NULL
+        DEFAULT current_timestamp
+    , PRIMARY KEY (batch, filename)
+);
+
+-- Key of the connections copied from the main db's urls table
+ALTER TABLE connections ADD COLUMN IF NOT EXISTS url_id int;
+CREATE UNIQUE INDEX IF NOT EXISTS connections_url_id_key ON connections (url_id);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+	  name varchar(64) PRIMARY KEY
+    , watermark text
+    , synced_at timestamptz NOT NULL
+        DEFAULT current_timestamp
+    , scanned int NOT NULL DEFAULT 0
+    , inserted int NOT NULL DEFAULT 0
+    , updated int NOT NULL DEFAULT 0
+    , deleted int NOT NULL DEFAULT 0
+);
@@ -1,49 +1,156 @@
 import csv
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from os import getenv, listdir, path
-from modules.db import connect_to_db, sanitize_row
+from psycopg2 import sql
+from modules.db import ConnectionPool
 from modules.custom_logger import CustomLogger
 
-def main(logger: CustomLogger):
-	def _upload_csv(connection, content, tablename):
-		if isinstance(content, (bytes, bytearray)):
-			content = content.decode("utf-8")
-
-		# Split into lines for csv.DictReader
-		lines = content.splitlines()
-		reader = csv.DictReader(lines)
-		cols = reader.fieldnames
-		if not cols:
-			raise ValueError("CSV content has no header row")
-
-		# Build INSERT statement
-		col_sql = ", ".join(f'"{c}"' for c in cols)
-		placeholders = ", ".join(["%s"] * len(cols))
-		insert_sql = (
-			f'INSERT INTO "{tablename}" ({col_sql}) '
-			f"VALUES ({placeholders})"
-		)
-
-		# Prepare data rows
-		data = []
-		for row in reader:
-			clean = sanitize_row(row)
-			data.append(tuple(clean[c] for c in cols))
-
-		# Execute batch insert
-		cur = connection.cursor()
-		try:
-			cur.executemany(insert_sql, data)
-			connection.commit()
-		except Exception as error:
-			connection.rollback()
-			logger.error(error)
-			raise error
-		finally:
-			cur.close()
-
-		logger.info(f"Inserted {len(data)} rows into {tablename}")
+# Bytes sent to the server per COPY chunk
+COPY_CHUNK_SIZE = 1 << 20
+
+# Optional file of a batch directory listing the tables each table
+# depends on, e.g. {"events": ["places"], "places": []}; without it the
+# dependencies are read from the foreign keys
+MANIFEST = "manifest.json"
+
+RECORD_PROGRESS_SQL = """
+	INSERT INTO import_progress (batch, filename, rows)
+	VALUES (%s, %s, %s)
+	ON CONFLICT (batch, filename) DO UPDATE
+	SET rows = EXCLUDED.rows, finished_at = current_timestamp
+"""
+
+FOREIGN_KEYS_SQL = """
+	SELECT child.relname, parent.relname
+	FROM pg_constraint c
+	JOIN pg_class child ON child.oid = c.conrelid
+	JOIN pg_class parent ON parent.oid = c.confrelid
+	WHERE c.contype = 'f' AND child.relname = ANY(%s) AND parent.relname = ANY(%s)
+"""
 
-	def _import_batches(connection, directory="data"):
+def main(logger: CustomLogger):
+	def _upload_csv(connection, csv_path, tablename, batch=None, chunk_size=COPY_CHUNK_SIZE):
+		"""
+		Stream a CSV file into tablename with COPY ... FROM STDIN, chunk_size
+		bytes at a time. Empty fields, quoted or not, are loaded as NULL.
+		With a batch, the file is recorded in import_progress in the same
+		transaction.
+		"""
+		with open(csv_path, encoding="utf-8", newline="") as f:
+			cols = next(csv.reader(f), None)
+			if not cols:
+				raise ValueError(f"{csv_path} has no header row")
+			f.seek(0)
+
+			columns = sql.SQL(", ").join(sql.Identifier(c) for c in cols)
+			copy_sql = sql.SQL(
+				"COPY {table} ({columns}) FROM STDIN "
+				"WITH (FORMAT csv, HEADER true, NULL '', FORCE_NULL ({columns}))"
+			).format(table=sql.Identifier(tablename), columns=columns)
+
+			start = time.perf_counter()
+			cur = connection.cursor()
+			try:
+				cur.copy_expert(copy_sql, f, size=chunk_size)
+				rows = cur.rowcount
+				if batch is not None:
+					cur.execute(RECORD_PROGRESS_SQL, (batch, path.basename(csv_path), rows))
+				connection.commit()
+			except Exception as error:
+				connection.rollback()
+				logger.error(error)
+				raise error
+			finally:
+				cur.close()
+
+		elapsed = time.perf_counter() - start
+		rate = rows / elapsed if elapsed > 0 else float("inf")
+		logger.info(f"Copied {rows} rows into {tablename} in {elapsed:.2f}s ({rate:.0f} rows/s)")
+		return rows
+
+	def _dependencies(connection, batch_path, tables):
+		"""
+		Tables of the batch each table depends on, from the manifest or
+		else from the foreign keys between them.
+		"""
+		manifest_path = path.join(batch_path, MANIFEST)
+		if path.exists(manifest_path):
+			with open(manifest_path, encoding="utf-8") as f:
+				manifest = json.load(f)
+			return {
+				table: {dep for dep in manifest.get(table, []) if dep in tables and dep != table}
+				for table in tables
+			}
+
+		deps = {table: set() for table in tables}
+		with connection.cursor() as cur:
+			cur.execute(FOREIGN_KEYS_SQL, (list(tables), list(tables)))
+			for child, parent in cur.fetchall():
+				if child != parent:
+					deps[child].add(parent)
+		connection.commit()
+		return deps
+
+	def _completed(connection, batch):
+		"""
+		Files of the batch imported by a previous run.
+		"""
+		with connection.cursor() as cur:
+			cur.execute("SELECT filename FROM import_progress WHERE batch = %s", (batch,))
+			done = {filename for filename, in cur.fetchall()}
+		connection.commit()
+		return done
+
+	def _import_batch(pool, executor, batch_num, batch_path):
+		"""
+		Import the CSV files of a batch, each table in its own transaction
+		on a pooled connection, as soon as the tables it depends on are in.
+		Returns the number of rows imported.
+		"""
+		files = {
+			path.splitext(fn)[0]: fn
+			for fn in sorted(listdir(batch_path))
+			if fn.endswith(".csv")
+		}
+
+		with pool.connection() as connection:
+			deps = _dependencies(connection, batch_path, files)
+			done = _completed(connection, batch_num)
+
+		finished = {table for table, fn in files.items() if fn in done}
+		if finished:
+			logger.info(f"Batch {batch_num}: skipping {len(finished)} files imported earlier.")
+		pending = {table: deps[table] - finished for table in files if table not in finished}
+
+		def load(table):
+			with pool.connection() as connection:
+				return _upload_csv(connection, path.join(batch_path, files[table]), table, batch=batch_num)
+
+		rows = 0
+		running = {}
+		while pending or running:
+			for table in [t for t, d in pending.items() if not d]:
+				del pending[table]
+				running[executor.submit(load, table)] = table
+			if not running:
+				raise ValueError(f"Batch {batch_num}: circular dependencies between {sorted(pending)}")
+
+			completed, _ = wait(running, return_when=FIRST_COMPLETED)
+			for future in completed:
+				table = running.pop(future)
+				try:
+					rows += future.result()
+				except Exception:
+					# Let the loads in flight finish (and be recorded) before failing.
+					wait(running)
+					raise
+				for d in pending.values():
+					d.discard(table)
+		return rows
+
+	def _import_batches(pool, directory="data", workers=4):
 		batch_names = [
 			name
 			for name in listdir(directory)
@@ -51,24 +158,17 @@ def main(logger: CustomLogger):
 		]
 
 		batch_nums = sorted(int(n) for n in batch_names)
-		for batch_num in batch_nums:
-			batch_dir = str(batch_num)
-			logger.info(f"Importing batch {batch_num}…")
-
-			full_batch_path = path.join(directory, batch_dir)
-			for fn in sorted(listdir(full_batch_path)):
-				if not fn.endswith(".csv"):
-					continue
+		with ThreadPoolExecutor(max_workers=workers) as executor:
+			for batch_num in batch_nums:
+				logger.info(f"Importing batch {batch_num}…")
 
-				csv_path = path.join(full_batch_path, fn)
-				with open(csv_path, encoding="utf-8") as f:
-					content = f.read()
+				start = time.perf_counter()
+				rows = _import_batch(pool, executor, batch_num, path.join(directory, str(batch_num)))
 
-				tablename = path.splitext(fn)[0]
-				_upload_csv(connection, content, tablename)
+				elapsed = time.perf_counter() - start
+				rate = rows / elapsed if elapsed > 0 else float("inf")
+				logger.info(f"Finished importing batch {batch_num}: {rows} rows in {elapsed:.2f}s ({rate:.0f} rows/s).")
 
-			logger.info(f"Finished importing batch {batch_num}.")
-	
 	# Purge all data if needed
 	purge = getenv("PURGE_DB", "false");
 	if (purge == "true"):
@@ -80,26 +180,26 @@ def main(logger: CustomLogger):
 	database = getenv("POSTGRES_DB", "mock")
 	host = getenv("POSTGRES_HOST", "postgres")
 	port = getenv("POSTGRES_PORT", "5432")
+	workers = int(getenv("IMPORT_WORKERS", "4"))
+
+	# Connections are retried while the database starts up and reused by
+	# the schema setup and the parallel import.
+	with ConnectionPool(database, user, password, host, port, minconn=workers, maxconn=workers) as pool:
+		try:
+			with pool.connection() as conn, conn.cursor() as cursor:
+				logger.info("Connected to the database.")
+
+				# Run init.sql
+				with open("initialize.sql", "r") as file:
+					script = file.read()
+					cursor.execute(script)
+			logger.info("Initiated schema.")
 
-	try:
-		conn = connect_to_db(database, user, password, host, port)
-		cursor = conn.cursor()
-		logger.info("Connected to the database.")
-
-		# Run init.sql
-		with open("initialize.sql", "r") as file:
-			sql = file.read()
-			cursor.execute(sql)
-		conn.commit()
-		logger.info("Initiated schema.")
-
-		# Import data in batches
-		_import_batches(conn)
-	except Exception as error:
-		logger.error(error)
-		raise error
-	finally:
-		cursor.close()
+			# Import data in batches, independent tables in parallel
+			_import_batches(pool, workers=workers)
+		except Exception as error:
+			logger.error(error)
+			raise error
 
 if __name__ == "__main__":
 	logger = CustomLogger("db-init")
@@ -0,0 +1,16 @@
+-- Migration for the main database (the one owning places and events),
+-- not run by init/main.py.
+--
+-- Trigram indexes behind the Tixa report's "trgm" match mode: its `%`
+-- filter on places.name and events.name uses them. CONCURRENTLY keeps
+-- the tables writable while the indexes are built, so run the statements
+-- outside a transaction, e.g.:
+--     psql "$MAIN_DB_URL" -f init/main_db/001_name_trgm_indexes.sql
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS places_name_trgm_idx
+    ON places USING gin (name gin_trgm_ops);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS events_name_trgm_idx
+    ON events USING gin (name gin_trgm_ops);
@@ -0,0 +1,259 @@
+"""
+Adaptive per-origin concurrency and delay (AIMD).
+
+A fixed pace keeps hitting an origin that has started to push back. The
+throttle learns a pace per origin from the outcome of every request:
+
+- success: additive increase, concurrency grows by `increase` per window
+  of concurrency successes and the delay shrinks by `delay_step`
+- blocked (anti-bot page), rate_limited (429/503) or timeout:
+  multiplicative decrease, concurrency is multiplied by `decrease` and the
+  delay divided by it (at least `backoff_delay`); a burst of failures
+  within one delay counts once
+- error: counted, limits unchanged
+
+The same instance is meant to be shared by the Playwright connectors and
+the fetchers, so a block seen by one slows down all of them. Fetchers only
+use the delay (they already send one request per origin at a time); the
+connectors lease slots, which enforce both limits.
+
+Usage:
+    throttle = AdaptiveThrottle()
+    async with throttle.track(url) as lease:
+        ...
+        if blocked:
+            lease.outcome = "blocked"
+    throttle.snapshot()
+"""
+from __future__ import annotations
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional
+from urllib.parse import urlparse
+from modules.custom_logger import CustomLogger
+
+SUCCESS = "success"
+BLOCKED = "blocked"
+RATE_LIMITED = "rate_limited"
+TIMEOUT = "timeout"
+ERROR = "error"
+
+_SLOWDOWNS = {BLOCKED, RATE_LIMITED, TIMEOUT}
+
+# How often a waiting lease re-checks a full origin (seconds)
+_POLL_INTERVAL = 0.05
+
+def origin_of(url: str) -> str:
+    """
+    scheme://host[:port] of a URL, lowercased; origins are passed through.
+    """
+    parsed = urlparse(url if "://" in url else "http://" + url)
+    netloc = (parsed.hostname or "").lower()
+    if parsed.port is not None:
+        netloc = f"{netloc}:{parsed.port}"
+    return f"{(parsed.scheme or 'http').lower()}://{netloc}"
+
+@dataclass
+class ThrottleLimits:
+    """
+    Public snapshot of an origin's current limits.
+    """
+    concurrency: int
+    delay: float  # seconds between request starts
+    active: int  # leases currently held
+    successes: int
+    slowdowns: int
+    last_outcome: Optional[str]
+
+@dataclass
+class _OriginState:
+    concurrency: float
+    delay: float
+    active: int = 0
+    next_start: float = 0.0  # monotonic timestamp
+    last_decrease: Optional[float] = None  # monotonic timestamp
+    successes: int = 0
+    slowdowns: int = 0
+    last_outcome: Optional[str] = None
+
+class Lease:
+    """
+    A held slot; set outcome to report something other than the default.
+    """
+    def __init__(self, origin: str):
+        self.origin = origin
+        self.outcome: Optional[str] = None
+
+class AdaptiveThrottle:
+    """
+    AIMD controller of concurrency and delay per origin, thread-safe.
+    """
+
+    def __init__(
+        self,
+        initial_concurrency: int = 2,
+        min_concurrency: int = 1,
+        max_concurrency: int = 8,
+        initial_delay: float = 1.0,
+        min_delay: float = 0.0,
+        max_delay: float = 120.0,
+        increase: float = 1.0,
+        delay_step: float = 0.1,
+        decrease: float = 0.5,
+        backoff_delay: float = 5.0,
+    ):
+        """
+        Parameters:
+            initial_concurrency: Parallel requests per origin at start
+            min_concurrency: Lower bound of concurrency
+            max_concurrency: Upper bound of concurrency
+            initial_delay: Seconds between request starts at start
+            min_delay: Lower bound of the delay
+            max_delay: Upper bound of the delay
+            increase: Concurrency added per window of successes
+            delay_step: Seconds removed from the delay per success
+            decrease: Factor applied on a slowdown (0 < decrease < 1)
+            backoff_delay: Smallest delay after a slowdown
+        """
+        if not 0 < decrease < 1:
+            raise ValueError(f"decrease must be between 0 and 1, got {decrease}.")
+        self.logger = CustomLogger("AdaptiveThrottle")
+        self.min_concurrency = max(1, int(min_concurrency))
+        self.max_concurrency = max(self.min_concurrency, int(max_concurrency))
+        self.initial_concurrency = min(max(int(initial_concurrency), self.min_concurrency), self.max_concurrency)
+        self.min_delay = max(0.0, float(min_delay))
+        self.max_delay = max(self.min_delay, float(max_delay))
+        self.initial_delay = min(max(float(initial_delay), self.min_delay), self.max_delay)
+        self.increase = float(increase)
+        self.delay_step = float(delay_step)
+        self.decrease = float(decrease)
+        self.backoff_delay = float(backoff_delay)
+
+        # origin -> _OriginState
+        self._origins: Dict[str, _OriginState] = {}
+        self._lock = threading.Lock()
+
+    def delay(self, url: str) -> float:
+        """
+        Current delay between request starts for the URL's origin.
+        """
+        with self._lock:
+            return self._state(origin_of(url)).delay
+
+    def concurrency(self, url: str) -> int:
+        """
+        Current number of parallel requests allowed to the URL's origin.
+        """
+        with self._lock:
+            return int(self._state(origin_of(url)).concurrency)
+
+    def record(self, url: str, outcome: str) -> None:
+        """
+        Feed the outcome of a request to the URL's origin.
+        """
+        origin = origin_of(url)
+        with self._lock:
+            state = self._state(origin)
+            state.last_outcome = outcome
+            if outcome == SUCCESS:
+                state.successes += 1
+                state.concurrency = min(
+                    self.max_concurrency, state.concurrency + self.increase / state.concurrency
+                )
+                state.delay = max(self.min_delay, state.delay - self.delay_step)
+                return
+            if outcome not in _SLOWDOWNS:
+                return
+
+            state.slowdowns += 1
+            now = time.monotonic()
+            if state.last_decrease is not None and now - state.last_decrease < state.delay:
+                return
+            state.last_decrease = now
+            state.concurrency = max(self.min_concurrency, state.concurrency * self.decrease)
+            state.delay = min(self.max_delay, max(state.delay / self.decrease, self.backoff_delay))
+            # Do not start anything before the new delay has passed.
+            state.next_start = max(state.next_start, now + state.delay)
+            concurrency, delay = int(state.concurrency), state.delay
+        self.logger.warning(
+            f"{outcome} on {origin}; slowing down to {concurrency} "
+            f"concurrent requests every {delay:.2f}s."
+        )
+
+    def snapshot(self) -> Dict[str, ThrottleLimits]:
+        """
+        Current limits and counters of every origin seen.
+        """
+        with self._lock:
+            return {
+                origin: ThrottleLimits(
+                    concurrency=int(state.concurrency),
+                    delay=state.delay,
+                    active=state.active,
+                    successes=state.successes,
+                    slowdowns=state.slowdowns,
+                    last_outcome=state.last_outcome,
+                )
+                for origin, state in self._origins.items()
+            }
+
+    @asynccontextmanager
+    async def track(self, url: str) -> AsyncIterator[Lease]:
+        """
+        Hold a slot of the URL's origin for one request and record its
+        outcome: lease.outcome if set, else timeout for exceptions named
+        like *Timeout*, error for other exceptions and success otherwise.
+        """
+        lease = Lease(origin_of(url))
+        while True:
+            wait = self._try_acquire(lease.origin)
+            if wait is None:
+                break
+            await asyncio.sleep(wait)
+        try:
+            yield lease
+        except BaseException as error:
+            self._finish(lease, error)
+            raise
+        self._finish(lease, None)
+
+    def _state(self, origin: str) -> _OriginState:
+        state = self._origins.get(origin)
+        if state is None:
+            state = self._origins[origin] = _OriginState(
+                concurrency=float(self.initial_concurrency), delay=self.initial_delay
+            )
+        return state
+
+    def _try_acquire(self, origin: str) -> Optional[float]:
+        """
+        Take a slot and return None, or return how long to wait.
+        """
+        with self._lock:
+            state = self._state(origin)
+            now = time.monotonic()
+            if state.active >= int(state.concurrency):
+                return _POLL_INTERVAL
+            if now < state.next_start:
+                return state.next_start - now
+            state.active += 1
+            state.next_start = now + state.delay
+            return None
+
+    def _finish(self, lease: Lease, error: Optional[BaseException]) -> None:
+        with self._lock:
+            self._state(lease.origin).active -= 1
+        outcome = lease.outcome
+        if outcome is None:
+            if error is None:
+                outcome = SUCCESS
+            elif isinstance(error, asyncio.CancelledError):
+                return
+            elif "Timeout" in type(error).__name__:
+                outcome = TIMEOUT
+            else:
+                outcome = ERROR
+        self.record(lease.origin, outcome)
@@ -0,0 +1,230 @@
+"""
+Shared pool of warm Playwright Chromium browsers.
+
+Launching Chromium dominates the latency of a single page scrape. The pool
+keeps a few browsers running and hands out pages in fresh, isolated
+browser contexts, so cookies and storage never leak between scrapes.
+
+A browser is retired (closed once its last page is returned, then replaced
+lazily) after max_navigations main-frame navigations, or when a page used
+more JS heap than max_memory_mb, as reported by the Chrome DevTools
+Protocol.
+
+Usage:
+    pool = BrowserPool(size=2)
+    async with pool.page(device="iPhone 13", locale="en-US") as page:
+        await page.goto(url)
+    await pool.close()
+"""
+from __future__ import annotations
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, List, Optional
+from playwright.async_api import Browser, Page, Playwright, async_playwright
+from modules.custom_logger import CustomLogger
+from modules.request_blocker import RequestBlocker
+
+@dataclass
+class _PooledBrowser:
+    browser: Browser
+    navigations: int = 0
+    active: int = 0  # pages currently leased
+    peak_heap: int = 0  # bytes, largest JS heap seen on one of its pages
+    retiring: bool = False
+
+class BrowserPool:
+    """
+    Pool of Chromium browsers handing out isolated pages.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        pages_per_browser: int = 4,
+        max_navigations: int = 100,
+        max_memory_mb: Optional[float] = None,
+        headless: bool = True,
+        launch_args: Optional[List[str]] = None,
+    ):
+        """
+        Parameters:
+            size: Number of warm browsers
+            pages_per_browser: Concurrent pages (contexts) per browser
+            max_navigations: Navigations after which a browser is recycled
+            max_memory_mb: JS heap of one page that triggers recycling
+            headless: Run the browsers headless
+            launch_args: Chromium command line arguments
+        """
+        self.logger = CustomLogger("BrowserPool")
+        self.size = max(1, int(size))
+        self.pages_per_browser = max(1, int(pages_per_browser))
+        self.max_navigations = max(1, int(max_navigations))
+        self.max_memory_mb = max_memory_mb
+        self.headless = headless
+        self.launch_args = (
+            launch_args
+            if launch_args is not None
+            else ["--disable-blink-features=AutomationControlled"]
+        )
+
+        self._playwright_manager = None
+        self._playwright: Optional[Playwright] = None
+        self._browsers: List[_PooledBrowser] = []
+        self._lock = asyncio.Lock()
+        self._slots = asyncio.Semaphore(self.size * self.pages_per_browser)
+
+    @property
+    def devices(self) -> Dict[str, dict]:
+        """
+        Playwright device descriptors (available once started).
+        """
+        if self._playwright is None:
+            raise RuntimeError("BrowserPool is not started.")
+        return self._playwright.devices
+
+    async def start(self) -> None:
+        """
+        Start Playwright; browsers are launched on first use.
+        """
+        async with self._lock:
+            if self._playwright is None:
+                self._playwright_manager = async_playwright()
+                self._playwright = await self._playwright_manager.start()
+                self.logger.info("Started Playwright.")
+
+    async def close(self) -> None:
+        """
+        Close every browser and stop Playwright.
+        """
+        async with self._lock:
+            for pooled in self._browsers:
+                await self._close_browser(pooled)
+            self._browsers.clear()
+            if self._playwright_manager is not None:
+                await self._playwright_manager.__aexit__(None, None, None)
+                self._playwright_manager = None
+                self._playwright = None
+                self.logger.info("Stopped Playwright.")
+
+    async def __aenter__(self) -> "BrowserPool":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    @asynccontextmanager
+    async def page(
+        self,
+        device: Optional[str] = None,
+        init_script: Optional[str] = None,
+        blocker: Optional[RequestBlocker] = None,
+        **context_options,
+    ) -> AsyncIterator[Page]:
+        """
+        Lease a page in a new browser context.
+
+        Parameters:
+            device: Playwright device name to emulate (e.g. "iPhone 13")
+            init_script: Script added to the context before any page script
+            blocker: Aborts unneeded requests; its stats are logged on return
+            **context_options: Forwarded to Browser.new_context
+        """
+        await self.start()
+        if device is not None:
+            context_options = {**self.devices[device], **context_options}
+
+        async with self._slots:
+            pooled = await self._acquire()
+            context = None
+            try:
+                context = await pooled.browser.new_context(**context_options)
+                if init_script:
+                    await context.add_init_script(init_script)
+                page = await context.new_page()
+
+                def _count(frame) -> None:
+                    if frame == page.main_frame:
+                        pooled.navigations += 1
+                page.on("framenavigated", _count)
+                stats = await blocker.attach(page) if blocker is not None else None
+
+                yield page
+
+                if stats is not None:
+                    self.logger.info(f"Request blocking: {stats.summary()}")
+
+                if self.max_memory_mb is not None:
+                    pooled.peak_heap = max(pooled.peak_heap, await self._heap_size(page))
+            finally:
+                if context is not None:
+                    try:
+                        await context.close()
+                    except Exception as error:
+                        self.logger.warning(f"Could not close browser context: {error}")
+                await self._release(pooled)
+
+    async def _acquire(self) -> _PooledBrowser:
+        async with self._lock:
+            live = [b for b in self._browsers if not b.retiring]
+            free = [b for b in live if b.active < self.pages_per_browser]
+            if not free or (len(live) < self.size and min(b.active for b in free) > 0):
+                pooled = _PooledBrowser(await self._launch())
+                self._browsers.append(pooled)
+            else:
+                pooled = min(free, key=lambda b: b.active)
+            pooled.active += 1
+            return pooled
+
+    async def _release(self, pooled: _PooledBrowser) -> None:
+        async with self._lock:
+            pooled.active -= 1
+            if not pooled.retiring:
+                if pooled.navigations >= self.max_navigations:
+                    pooled.retiring = True
+                    self.logger.info(
+                        f"Recycling browser after {pooled.navigations} navigations."
+                    )
+                elif (
+                    self.max_memory_mb is not None
+                    and pooled.peak_heap > self.max_memory_mb * 1024 * 1024
+                ):
+                    pooled.retiring = True
+                    self.logger.info(
+                        f"Recycling browser using {pooled.peak_heap / 1024 / 1024:.1f}MB of JS heap."
+                    )
+            if pooled.retiring and pooled.active == 0:
+                self._browsers.remove(pooled)
+                await self._close_browser(pooled)
+
+    async def _launch(self) -> Browser:
+        browser = await self._playwright.chromium.launch(
+            headless=self.headless,
+            args=self.launch_args,
+        )
+        self.logger.info(f"Launched browser ({len(self._browsers) + 1} in pool).")
+        return browser
+
+    async def _close_browser(self, pooled: _PooledBrowser) -> None:
+        try:
+            await pooled.browser.close()
+        except Exception as error:
+            self.logger.warning(f"Could not close browser: {error}")
+
+    async def _heap_size(self, page: Page) -> int:
+        """
+        JS heap of the page in bytes via CDP (0 if unavailable).
+        """
+        try:
+            session = await page.context.new_cdp_session(page)
+            await session.send("Performance.enable")
+            metrics = await session.send("Performance.getMetrics")
+            await session.detach()
+        except Exception as error:
+            self.logger.debug(f"Could not read page metrics: {error}")
+            return 0
+        for metric in metrics.get("metrics", []):
+            if metric.get("name") == "JSHeapTotalSize":
+                return int(metric.get("value", 0))
+        return 0
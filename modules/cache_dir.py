@@ -0,0 +1,31 @@
+"""
+Default location of the scrapers' on-disk state.
+
+Browser storage state (session cookies), cached responses, robots.txt
+rules and rate limit timestamps are kept under one directory instead of
+the working directory, so they never end up in a checkout:
+
+- $SCRAPER_CACHE_DIR if set (e.g. a volume shared by the containers)
+- otherwise $XDG_CACHE_HOME/tivornya-scrapers, ~/.cache/tivornya-scrapers
+  when XDG_CACHE_HOME is not set
+
+Usage:
+    store = StorageStateStore(cache_path("storage_state"))
+"""
+import os
+
+def cache_dir() -> str:
+    """
+    Directory of the scrapers' on-disk state.
+    """
+    directory = os.getenv("SCRAPER_CACHE_DIR")
+    if directory:
+        return directory
+    base = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "tivornya-scrapers")
+
+def cache_path(name: str) -> str:
+    """
+    Path of a file or directory in the cache directory.
+    """
+    return os.path.join(cache_dir(), name)
@@ -1,10 +1,21 @@
 # robots_fetcher.py
 from __future__ import annotations
+import asyncio
+import queue
+import random
+import threading
 import time
-from dataclasses import dataclass
-from typing import Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 from urllib.parse import urlparse, urlunparse
+from modules.adaptive_throttle import BLOCKED, ERROR, RATE_LIMITED, SUCCESS, TIMEOUT, AdaptiveThrottle
 from modules.custom_logger import CustomLogger
+from modules.rate_limiter import RateLimiter
+from modules.response_cache import ResponseCache
+from modules.robots_cache import RobotsCache, RobotsCacheEntry
+from modules.robots_matcher import RobotsMatcher
 
 import requests
 from urllib.robotparser import RobotFileParser
@@ -30,11 +41,62 @@ class RobotsRateLimitError(RobotsError):
         self.url = url
         self.wait_seconds = wait_seconds
 
+class CircuitOpenError(Exception):
+    def __init__(self, url: str, retry_in: float):
+        super().__init__(
+            f"Origin is unhealthy; circuit open for another ~{retry_in:.2f}s: "
+            f"{url}."
+        )
+        self.url = url
+        self.retry_in = retry_in
+
+class RetriesExhaustedError(requests.HTTPError):
+    def __init__(self, url: str, response: requests.Response, retries: int):
+        super().__init__(
+            f"Still {response.status_code} after {retries} retries: {url}.",
+            response=response,
+        )
+        self.url = url
+        self.retries = retries
+
+# Statuses meaning "slow down", retried with backoff.
+_RETRY_STATUSES = {429, 503}
+
+@dataclass
+class _CircuitBreaker:
+    failures: int = 0  # consecutive failed requests
+    open_until: Optional[float] = None  # monotonic timestamp
+
+@dataclass
+class BreakerState:
+    """
+    Public snapshot of an origin's circuit breaker.
+    """
+    state: str  # "closed", "open" or "half-open"
+    failures: int
+    retry_in: float  # seconds until requests are allowed again
+
 @dataclass
 class _DomainState:
     parser: RobotFileParser
     min_delay: float  # seconds (0 if none)
     last_request_ts: Optional[float]  # monotonic timestamp
+    matcher: Optional[RobotsMatcher] = None  # parser compiled for user_agent
+    breaker: _CircuitBreaker = field(default_factory=_CircuitBreaker)
+
+@dataclass
+class FetchResult:
+    """
+    Outcome of one URL in a fetch_many batch: a response or the error.
+    """
+    url: str
+    origin: Tuple[str, str, Optional[int]]
+    response: Optional[requests.Response] = None
+    error: Optional[Exception] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
 
 def _normalize_origin(url: str) -> Tuple[str, str, Optional[int]]:
     """
@@ -51,15 +113,9 @@ def _origin_to_base_url(origin: Tuple[str, str, Optional[int]]) -> str:
     netloc = host if port is None else f"{host}:{port}"
     return urlunparse((scheme, netloc, "", "", "", ""))
 
-class CustomFetcher:
+class _BaseFetcher:
     """
-    A fetcher that enforces robots.txt per origin.
-
-    - Caches robots.txt per origin (scheme + host + port)
-    - Enforces Allow/Disallow via urllib.robotparser
-    - Honors Crawl-delay and Request-rate
-    - Tracks last request time per origin to respect delays
-    - If robots.txt can't be fetched: assumes allowed with no delay
+    Shared robots.txt bookkeeping for the sync and async fetchers.
     """
 
     def __init__(
@@ -67,18 +123,468 @@ class CustomFetcher:
         user_agent: str = "GenericBot/1.0",
         timeout: float = 10.0,
         default_min_delay: float = 0.0,
+        robots_cache: Optional[RobotsCache] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        response_cache: Optional[ResponseCache] = None,
+        max_retries: int = 3,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        breaker_threshold: int = 5,
+        breaker_cooldown: float = 300.0,
+        throttle: Optional[AdaptiveThrottle] = None,
     ):
-        self.logger = CustomLogger("CustomFetcher")
+        """
+        Parameters:
+            user_agent: User agent for robots.txt rules and requests
+            timeout: Default per-request timeout (seconds)
+            default_min_delay: Minimum spacing per origin (seconds)
+            robots_cache: Persistent robots.txt cache shared across runs
+            rate_limiter: Rate limiter shared with other processes
+            response_cache: On-disk cache for conditional GETs
+            max_retries: Retries of 429/503 responses
+            backoff_base: First backoff delay (seconds), doubled per retry
+            backoff_max: Longest delay slept before a retry (seconds)
+            breaker_threshold: Consecutive failures that open the breaker
+            breaker_cooldown: How long an open breaker blocks (seconds)
+            throttle: Adaptive delay per origin, shared with the connectors;
+                      the spacing used is the larger of it and min_delay
+        """
+        self.logger = CustomLogger(type(self).__name__)
         self.user_agent = user_agent
         self.timeout = float(timeout)
         self.default_min_delay = max(0.0, float(default_min_delay))
-
-        self._session = requests.Session()
-        self._session.headers.update({"User-Agent": self.user_agent})
+        self.robots_cache = robots_cache
+        self.rate_limiter = rate_limiter
+        self.response_cache = response_cache
+        self.max_retries = max(0, int(max_retries))
+        self.backoff_base = float(backoff_base)
+        self.backoff_max = float(backoff_max)
+        self.breaker_threshold = max(1, int(breaker_threshold))
+        self.breaker_cooldown = float(breaker_cooldown)
+        self.throttle = throttle
 
         # origin -> _DomainState
         self._domains: Dict[Tuple[str, str, Optional[int]], _DomainState] = {}
 
+    def _group_by_origin(
+        self, urls: Iterable[str]
+    ) -> Dict[Tuple[str, str, Optional[int]], List[str]]:
+        """
+        Split URLs into per-origin queues, keeping their order.
+        """
+        queues: Dict[Tuple[str, str, Optional[int]], List[str]] = {}
+        for url in urls:
+            queues.setdefault(_normalize_origin(url), []).append(url)
+        self.logger.info(
+            f"Batch of {sum(len(q) for q in queues.values())} URLs "
+            f"across {len(queues)} origins."
+        )
+        return queues
+
+    def _new_session(self) -> requests.Session:
+        session = requests.Session()
+        session.headers.update({"User-Agent": self.user_agent})
+        return session
+
+    def _send(
+        self,
+        session: requests.Session,
+        method: str,
+        u: str,
+        timeout: Optional[float],
+        request_kwargs: dict,
+    ) -> requests.Response:
+        """
+        Perform one HTTP request, revalidating against the response cache.
+        """
+        timeout = timeout if timeout is not None else self.timeout
+        cache = self.response_cache if method.upper() == "GET" else None
+        if cache is None:
+            return session.request(method=method, url=u, timeout=timeout, **request_kwargs)
+
+        kwargs = dict(request_kwargs)
+        kwargs["headers"] = {
+            **cache.conditional_headers(u),
+            **(request_kwargs.get("headers") or {}),
+        }
+        resp = session.request(method=method, url=u, timeout=timeout, **kwargs)
+        if resp.status_code == 304:
+            cached = cache.not_modified(u, resp)
+            if cached is not None:
+                return cached
+            # Body evicted meanwhile: ask for the full response.
+            self.logger.debug(f"Cached body missing for {u}; refetching.")
+            resp = session.request(method=method, url=u, timeout=timeout, **request_kwargs)
+        cache.store(u, resp)
+        return resp
+
+    def _parse_robots(
+        self,
+        robots_url: str,
+        response: Optional[requests.Response],
+        error: Optional[Exception] = None,
+    ) -> Tuple[RobotFileParser, Optional[List[str]]]:
+        """
+        Build a parser from a robots.txt response (or the error fetching it).
+
+        Also returns the parsed lines, or None when the fetch failed (an
+        error, 429 or 5xx) and the result should not be cached: only 2xx
+        and 4xx outcomes say what the site's rules are.
+        """
+        lines: Optional[List[str]] = []
+        if error is not None:
+            lines = None
+            self.logger.warning(
+                f"Failed to fetch robots.txt from {robots_url}: {error}. "
+                "Assuming allow with no delay."
+            )
+        elif response is not None and (response.status_code == 429 or response.status_code >= 500):
+            lines = None
+            self.logger.warning(
+                f"Got {response.status_code} for robots.txt from {robots_url}. "
+                "Assuming allow with no delay, without caching it."
+            )
+        elif response is not None and response.ok and response.text:
+            lines = response.text.splitlines()
+            self.logger.info(
+                f"Loaded robots.txt from {robots_url} (status {response.status_code})"
+            )
+        else:
+            self.logger.warning(
+                f"No robots.txt or empty response at {robots_url}; "
+                "assuming allow with no delay."
+            )
+
+        parser = RobotFileParser()
+        parser.set_url(robots_url)
+        parser.parse(lines or [])
+        return parser, lines
+
+    def _cached_parser(
+        self, origin: Tuple[str, str, Optional[int]]
+    ) -> Optional[Tuple[RobotFileParser, Optional[float]]]:
+        """
+        Parser and min_delay from the persistent robots cache, if fresh.
+
+        The cached min_delay is only reused when it was computed for the
+        same user agent; otherwise it is recomputed from the rules.
+        """
+        if self.robots_cache is None:
+            return None
+
+        base = _origin_to_base_url(origin)
+        try:
+            entry = self.robots_cache.get(base)
+        except Exception as e:
+            self.logger.warning(f"Robots cache lookup failed for {base}: {e}")
+            return None
+        if entry is None:
+            return None
+
+        parser = RobotFileParser()
+        parser.set_url(f"{base.rstrip('/')}/robots.txt")
+        parser.parse(entry.lines)
+        self.logger.info(f"Loaded robots.txt for {base} from cache.")
+
+        min_delay = None
+        if entry.user_agent == self.user_agent:
+            min_delay = max(entry.min_delay, self.default_min_delay)
+        return parser, min_delay
+
+    def _store_cached(
+        self,
+        origin: Tuple[str, str, Optional[int]],
+        lines: Optional[List[str]],
+        state: _DomainState,
+    ) -> None:
+        if self.robots_cache is None or lines is None:
+            return
+
+        base = _origin_to_base_url(origin)
+        entry = RobotsCacheEntry(
+            lines=lines,
+            min_delay=state.min_delay,
+            fetched_at=time.time(),
+            user_agent=self.user_agent,
+        )
+        try:
+            self.robots_cache.put(base, entry)
+        except Exception as e:
+            self.logger.warning(f"Could not cache robots.txt for {base}: {e}")
+
+    def _register_domain(
+        self,
+        origin: Tuple[str, str, Optional[int]],
+        parser: RobotFileParser,
+        min_delay: Optional[float] = None,
+    ) -> _DomainState:
+        if min_delay is None:
+            # Compute minimum spacing from Crawl-delay and Request-rate
+            cd = parser.crawl_delay(self.user_agent)
+            rr = parser.request_rate(self.user_agent)
+
+            delay_from_cd = float(cd) if cd is not None else 0.0
+            delay_from_rr = 0.0
+            if rr is not None and getattr(rr, "requests", None) and getattr(
+                rr, "seconds", None
+            ):
+                if rr.requests > 0:
+                    delay_from_rr = float(rr.seconds) / float(rr.requests)
+
+            min_delay = max(delay_from_cd, delay_from_rr, self.default_min_delay)
+
+        state = _DomainState(
+            parser=parser,
+            min_delay=min_delay,
+            last_request_ts=None,
+            matcher=RobotsMatcher(parser, self.user_agent),
+        )
+        self._domains[origin] = state
+        self.logger.debug(
+            f"Initialized domain state for {origin}: min_delay={min_delay:.2f}s"
+        )
+        return state
+
+    def breaker_state(self, url: str) -> BreakerState:
+        """
+        Circuit breaker state of the URL's origin.
+
+        Batch callers can use retry_in to reschedule work for an origin
+        whose breaker is open. Unknown origins are reported closed.
+        """
+        state = self._domains.get(_normalize_origin(url))
+        if state is None:
+            return BreakerState("closed", 0, 0.0)
+        breaker = state.breaker
+        if breaker.open_until is None:
+            return BreakerState("closed", breaker.failures, 0.0)
+        retry_in = breaker.open_until - time.monotonic()
+        if retry_in > 0:
+            return BreakerState("open", breaker.failures, retry_in)
+        return BreakerState("half-open", breaker.failures, 0.0)
+
+    def _check_breaker(self, state: _DomainState, u: str) -> None:
+        open_until = state.breaker.open_until
+        if open_until is not None:
+            retry_in = open_until - time.monotonic()
+            if retry_in > 0:
+                self.logger.warning(
+                    f"Circuit open for {retry_in:.2f}s; not fetching {u}."
+                )
+                raise CircuitOpenError(u, retry_in)
+
+    def _record_outcome(
+        self,
+        state: _DomainState,
+        u: str,
+        resp: Optional[requests.Response],
+        cooldown: Optional[float] = None,
+        error: Optional[Exception] = None,
+    ) -> None:
+        """
+        Update the origin's breaker and the throttle after a request
+        (resp None: it raised error).
+        """
+        if self.throttle is not None:
+            if resp is None:
+                outcome = TIMEOUT if isinstance(error, requests.Timeout) else ERROR
+            elif resp.status_code in _RETRY_STATUSES:
+                outcome = RATE_LIMITED
+            elif resp.status_code == 403:
+                outcome = BLOCKED
+            else:
+                outcome = SUCCESS
+            self.throttle.record(u, outcome)
+
+        breaker = state.breaker
+        if resp is not None and resp.status_code not in _RETRY_STATUSES:
+            if breaker.failures:
+                self.logger.info(f"Origin healthy again after {u}; closing circuit.")
+            breaker.failures = 0
+            breaker.open_until = None
+            return
+
+        breaker.failures += 1
+        if breaker.failures >= self.breaker_threshold or cooldown is not None:
+            cooldown = max(cooldown or 0.0, self.breaker_cooldown)
+            breaker.open_until = time.monotonic() + cooldown
+            self.logger.error(
+                f"{breaker.failures} consecutive failures ending with {u}; "
+                f"opening circuit for {cooldown:.2f}s."
+            )
+
+    def _finish(
+        self,
+        state: _DomainState,
+        u: str,
+        resp: requests.Response,
+        cooldown: Optional[float],
+        retries: int,
+    ) -> None:
+        """
+        Record the final response of a fetch; raise RetriesExhaustedError
+        if it is still a 429/503.
+        """
+        self._record_outcome(state, u, resp, cooldown)
+        if resp.status_code in _RETRY_STATUSES:
+            raise RetriesExhaustedError(u, resp, retries)
+
+    def _retry_after(self, resp: requests.Response) -> Optional[float]:
+        """
+        Seconds requested by a Retry-After header (delta or HTTP date).
+        """
+        value = resp.headers.get("Retry-After")
+        if not value:
+            return None
+        value = value.strip()
+        if value.isdigit():
+            return float(value)
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    def _retry_delay(
+        self, resp: requests.Response, attempt: int, state: _DomainState
+    ) -> Tuple[Optional[float], Optional[float]]:
+        """
+        Decide whether to retry a response.
+
+        Returns (delay, cooldown): sleep delay seconds and retry, or, when
+        delay is None, stop; a cooldown then asks for the circuit to open
+        for that long because the server's Retry-After exceeds backoff_max.
+        """
+        if resp.status_code not in _RETRY_STATUSES:
+            return None, None
+
+        retry_after = self._retry_after(resp)
+        if retry_after is not None and retry_after > self.backoff_max:
+            return None, retry_after
+        if attempt >= self.max_retries:
+            return None, None
+
+        if retry_after is None:
+            backoff = self.backoff_base * (2 ** attempt)
+            # Full jitter keeps workers from retrying in lockstep.
+            retry_after = random.uniform(backoff / 2, backoff)
+        return min(max(retry_after, state.min_delay), self.backoff_max), None
+
+    def _min_delay(self, origin: Tuple[str, str, Optional[int]], state: _DomainState) -> float:
+        """
+        Spacing to keep for origin: robots min_delay or the throttle's delay.
+        """
+        if self.throttle is None:
+            return state.min_delay
+        return max(state.min_delay, self.throttle.delay(_origin_to_base_url(origin)))
+
+    def _remaining_delay(self, state: _DomainState, min_delay: Optional[float] = None) -> float:
+        if min_delay is None:
+            min_delay = state.min_delay
+        if min_delay > 0 and state.last_request_ts is not None:
+            return min_delay - (time.monotonic() - state.last_request_ts)
+        return 0.0
+
+    def _reserve_slot(
+        self,
+        origin: Tuple[str, str, Optional[int]],
+        state: _DomainState,
+        wait: bool,
+    ) -> Tuple[bool, float]:
+        """
+        Return (may_send, delay) for the next request to origin.
+
+        Uses the shared rate limiter when one is configured, so the
+        spacing holds across processes; otherwise the in-memory
+        last_request_ts of this fetcher.
+        """
+        min_delay = self._min_delay(origin, state)
+        if min_delay <= 0:
+            return True, 0.0
+        if self.rate_limiter is not None:
+            return self.rate_limiter.reserve(
+                _origin_to_base_url(origin), min_delay, wait
+            )
+        remaining = self._remaining_delay(state, min_delay)
+        return (wait or remaining <= 0), max(0.0, remaining)
+
+    def _candidate_urls(
+        self, url: str, url_modifier: Optional[Callable[[str], List[str]]]
+    ) -> List[str]:
+        """
+        Deduplicated alternatives from url_modifier, in order.
+        """
+        seen: set[str] = set()
+        candidates: List[str] = []
+        try:
+            for cand in url_modifier(url) or []:
+                if cand not in seen:
+                    seen.add(cand)
+                    candidates.append(cand)
+        except Exception as e:
+            self.logger.error(
+                f"url_modifier raised an exception; skipping alternatives. {e}"
+            )
+            candidates = []
+        return candidates
+
+    def _failure(
+        self, url: str, best_wait: Optional[Tuple[str, float]]
+    ) -> RobotsError:
+        """
+        Pick the error to raise once every URL option has failed.
+        """
+        if best_wait is not None:
+            url_for_error, wait_secs = best_wait
+            self.logger.error(
+                f"No candidate immediately fetchable; shortest wait is "
+                f"{wait_secs:.2f}s for {url_for_error}."
+            )
+            return RobotsRateLimitError(url_for_error, wait_secs)
+
+        # Either original was disallowed and no candidates helped, or
+        # original was allowed but rate-limited with wait=False and no
+        # modifier was provided (covered by _attempt's behavior only if we
+        # were to handle original rate-limit differently). In our flow,
+        # if original was allowed-but-limited and wait=False, we didn't
+        # raise yet because we only branch alternatives on 'disallowed'.
+        # Since we get here only when original was disallowed (disallowed=True)
+        # or alternatives exhausted, raise disallow for original.
+        self.logger.error(
+            "All URL options disallowed by robots.txt or no alternatives provided."
+        )
+        return RobotsDisallowError(url, self.user_agent)
+
+class CustomFetcher(_BaseFetcher):
+    """
+    A fetcher that enforces robots.txt per origin.
+
+    - Caches robots.txt per origin (scheme + host + port), optionally
+      persisted across runs through a RobotsCache backend
+    - Enforces Allow/Disallow via urllib.robotparser rules, compiled
+      once per origin into a RobotsMatcher
+    - Honors Crawl-delay and Request-rate
+    - Tracks last request time per origin to respect delays, optionally
+      through a RateLimiter shared with other processes
+    - If robots.txt can't be fetched: assumes allowed with no delay
+    - Optionally revalidates GETs against an on-disk ResponseCache
+    - Retries 429/503 with exponential backoff honoring Retry-After (each
+      retry waits for a rate limiter slot), raises RetriesExhaustedError
+      when they keep coming and stops calling an origin while its circuit
+      breaker is open
+    - Optionally spaces requests by an AdaptiveThrottle shared with the
+      Playwright connectors and reports every outcome to it
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # origin -> requests.Session; requests.Session is not thread-safe,
+        # and fetch_many drains each origin on a single worker
+        self._sessions: Dict[Tuple[str, str, Optional[int]], requests.Session] = {}
+        self._sessions_lock = threading.Lock()
+        # origin -> lock guarding the robots.txt download, so a slow origin
+        # only holds up the fetch_many workers of that origin
+        self._load_locks: Dict[Tuple[str, str, Optional[int]], threading.Lock] = {}
+
     def fetch(
         self,
         url: str,
@@ -97,6 +603,8 @@ class CustomFetcher:
           rate-limited (or wait=True).
         - If all options fail, raise RobotsDisallowError or
           RobotsRateLimitError accordingly.
+        - If the response is still 429/503 after the retries, raise
+          RetriesExhaustedError (a requests.HTTPError carrying it).
 
         Parameters:
             url: Target URL
@@ -123,42 +631,57 @@ class CustomFetcher:
             state = self._domains[origin]
 
             # Allow/Disallow
-            if not state.parser.can_fetch(self.user_agent, u):
+            if not state.matcher.can_fetch(u):
                 self.logger.debug(f"Disallowed by robots.txt: {u}")
                 return False, None, 0.0, True
 
-            # Rate limiting
-            now = time.monotonic()
-            remaining = 0.0
-            if state.min_delay > 0 and state.last_request_ts is not None:
-                elapsed = now - state.last_request_ts
-                remaining = state.min_delay - elapsed
+            self._check_breaker(state, u)
 
+            # Rate limiting
+            may_send, remaining = self._reserve_slot(origin, state, wait)
+            if not may_send:
+                self.logger.info(
+                    f"Rate-limited for {remaining:.2f}s on {u}, "
+                    f"wait=False; will consider alternatives."
+                )
+                return False, None, remaining, False
             if remaining > 0:
-                if not wait:
-                    self.logger.info(
-                        f"Rate-limited for {remaining:.2f}s on {u}, "
-                        f"wait=False; will consider alternatives."
-                    )
-                    return False, None, remaining, False
                 self.logger.debug(f"Sleeping {remaining:.2f}s before fetching {u}")
                 time.sleep(remaining)
 
-            # Perform request
-            self.logger.info(f"Fetching {u}")
-            resp = self._session.request(
-                method=method,
-                url=u,
-                timeout=(timeout if timeout is not None else self.timeout),
-                **request_kwargs,
-            )
+            # Perform request, backing off on 429/503
+            attempt = 0
+            while True:
+                self.logger.info(f"Fetching {u}")
+                try:
+                    resp = self._send(self._session_for(origin), method, u, timeout, request_kwargs)
+                except requests.RequestException as error:
+                    self._record_outcome(state, u, None, error=error)
+                    raise
+                finally:
+                    # Update last request timestamp
+                    state.last_request_ts = time.monotonic()
+                self.logger.debug(
+                    f"Fetched {u} with status {resp.status_code}; "
+                    f"min_delay={state.min_delay:.2f}s"
+                )
 
-            # Update last request timestamp
-            self._domains[origin].last_request_ts = time.monotonic()
-            self.logger.debug(
-                f"Fetched {u} with status {resp.status_code}; "
-                f"min_delay={state.min_delay:.2f}s"
-            )
+                delay, cooldown = self._retry_delay(resp, attempt, state)
+                if delay is None:
+                    break
+                attempt += 1
+                self.logger.warning(
+                    f"Got {resp.status_code} for {u}; retry {attempt}/"
+                    f"{self.max_retries} in {delay:.2f}s."
+                )
+                time.sleep(delay)
+                # Retries take a slot like any request, so the shared
+                # per-origin spacing holds for them too.
+                _, remaining = self._reserve_slot(origin, state, True)
+                if remaining > 0:
+                    time.sleep(remaining)
+
+            self._finish(state, u, resp, cooldown, attempt)
             return True, resp, 0.0, False
 
         # First, try the original URL
@@ -174,21 +697,7 @@ class CustomFetcher:
                 f"Original URL disallowed: {url}. Trying modified candidates."
             )
 
-            # Deduplicate candidates while preserving order
-            seen: set[str] = set()
-            candidates: List[str] = []
-            try:
-                for cand in url_modifier(url) or []:
-                    if cand not in seen:
-                        seen.add(cand)
-                        candidates.append(cand)
-            except Exception as e:
-                self.logger.error(
-                    f"url_modifier raised an exception; skipping alternatives. {e}"
-                )
-                candidates = []
-
-            for cand in candidates:
+            for cand in self._candidate_urls(url, url_modifier):
                 self.logger.info(f"Trying candidate URL: {cand}")
                 s, r, rem, d = _attempt(cand)
                 if s: return r
@@ -199,26 +708,59 @@ class CustomFetcher:
                         best_wait = (cand, rem)
 
         # No success. Decide which error to raise.
-        if best_wait is not None:
-            url_for_error, wait_secs = best_wait
-            self.logger.error(
-                f"No candidate immediately fetchable; shortest wait is "
-                f"{wait_secs:.2f}s for {url_for_error}."
-            )
-            raise RobotsRateLimitError(url_for_error, wait_secs)
+        raise self._failure(url, best_wait)
 
-        # Either original was disallowed and no candidates helped, or
-        # original was allowed but rate-limited with wait=False and no
-        # modifier was provided (covered by _attempt's behavior only if we
-        # were to handle original rate-limit differently). In our flow,
-        # if original was allowed-but-limited and wait=False, we didn't
-        # raise yet because we only branch alternatives on 'disallowed'.
-        # Since we get here only when original was disallowed (disallowed=True)
-        # or alternatives exhausted, raise disallow for original.
-        self.logger.error(
-            "All URL options disallowed by robots.txt or no alternatives provided."
-        )
-        raise RobotsDisallowError(url, self.user_agent)
+    def fetch_many(
+        self,
+        urls: Iterable[str],
+        max_workers: int = 8,
+        **fetch_kwargs,
+    ) -> Iterator[FetchResult]:
+        """
+        Fetch many URLs on a thread pool, yielding results as they complete.
+
+        URLs are grouped by origin and each origin's queue is drained by a
+        single worker at its robots min_delay, so at most max_workers
+        origins are crawled at once. Failures (RobotsDisallowError,
+        RobotsRateLimitError, request errors) are yielded as per-URL
+        results instead of aborting the batch.
+
+        Parameters:
+            urls: URLs to fetch
+            max_workers: Size of the thread pool
+            **fetch_kwargs: Forwarded to fetch (wait, method, url_modifier...)
+        """
+        queues = self._group_by_origin(urls)
+        total = sum(len(q) for q in queues.values())
+        results: "queue.Queue[FetchResult]" = queue.Queue()
+        stop = threading.Event()
+
+        def _drain(origin: Tuple[str, str, Optional[int]], batch: List[str]) -> None:
+            for u in batch:
+                if stop.is_set():
+                    return
+                try:
+                    results.put(FetchResult(u, origin, response=self.fetch(u, **fetch_kwargs)))
+                except Exception as e:
+                    self.logger.warning(f"Batch fetch failed for {u}: {e}")
+                    results.put(FetchResult(u, origin, error=e))
+
+        pool = ThreadPoolExecutor(max_workers=max(1, max_workers))
+        try:
+            for origin, batch in queues.items():
+                pool.submit(_drain, origin, batch)
+            for _ in range(total):
+                yield results.get()
+        finally:
+            stop.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def can_fetch(self, url: str) -> bool:
+        """
+        Whether robots.txt allows fetching the URL, without fetching it.
+        """
+        origin = self._ensure_domain_loaded(url)
+        return self._domains[origin].matcher.can_fetch(url)
 
     def get_min_delay_for(self, url: str) -> float:
         """
@@ -229,6 +771,22 @@ class CustomFetcher:
         self.logger.debug(f"Min delay for origin {origin}: {delay:.2f}s")
         return delay
 
+    def close(self) -> None:
+        """
+        Close every per-origin session.
+        """
+        with self._sessions_lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    def _session_for(self, origin: Tuple[str, str, Optional[int]]) -> requests.Session:
+        with self._sessions_lock:
+            session = self._sessions.get(origin)
+            if session is None:
+                session = self._sessions[origin] = self._new_session()
+            return session
+
     def _ensure_domain_loaded(
         self, url: str
     ) -> Tuple[str, str, Optional[int]]:
@@ -236,55 +794,281 @@ class CustomFetcher:
         if origin in self._domains:
             return origin
 
-        base = _origin_to_base_url(origin)
-        robots_url = f"{base.rstrip('/')}/robots.txt"
+        with self._load_locks.setdefault(origin, threading.Lock()):
+            # fetch_many workers may race for the same origin.
+            if origin in self._domains:
+                return origin
 
-        parser = RobotFileParser()
-        try:
-            r = self._session.get(robots_url, timeout=self.timeout)
-            if r.ok and r.text:
-                parser.set_url(robots_url)
-                parser.parse(r.text.splitlines())
+            cached = self._cached_parser(origin)
+            if cached is not None:
+                self._register_domain(origin, *cached)
+                return origin
+
+            base = _origin_to_base_url(origin)
+            robots_url = f"{base.rstrip('/')}/robots.txt"
+
+            try:
+                r = self._session_for(origin).get(robots_url, timeout=self.timeout)
+                parser, lines = self._parse_robots(robots_url, r)
+            except requests.RequestException as e:
+                parser, lines = self._parse_robots(robots_url, None, e)
+
+            state = self._register_domain(origin, parser)
+            self._store_cached(origin, lines, state)
+        return origin
+
+class AsyncCustomFetcher(_BaseFetcher):
+    """
+    asyncio variant of CustomFetcher with the same robots.txt semantics.
+
+    Every origin has its own session, robots state and schedule, so
+    requests to different origins run in parallel while requests to the
+    same origin are still spaced by its min_delay. Blocking HTTP calls
+    run in worker threads via asyncio.to_thread.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        # origin -> requests.Session
+        self._sessions: Dict[Tuple[str, str, Optional[int]], requests.Session] = {}
+        # origin -> lock serializing requests while a delay applies
+        self._locks: Dict[Tuple[str, str, Optional[int]], asyncio.Lock] = {}
+        # origin -> lock guarding the robots.txt download
+        self._load_locks: Dict[Tuple[str, str, Optional[int]], asyncio.Lock] = {}
+
+    async def fetch(
+        self,
+        url: str,
+        wait: bool = True,
+        method: str = "GET",
+        timeout: Optional[float] = None,
+        url_modifier: Optional[Callable[[str], List[str]]] = None,
+        **request_kwargs,
+    ) -> requests.Response:
+        """
+        Fetch a URL in compliance with robots.txt without blocking the loop.
+
+        Parameters and errors are the same as CustomFetcher.fetch. Only
+        callers hitting the same origin wait for each other; run several
+        fetches with asyncio.gather to crawl many origins at once.
+        """
+        self.logger.debug(f"Fetch requested: {url} (method={method}, wait={wait})")
+
+        async def _attempt(u: str) -> Tuple[bool, Optional[requests.Response], float, bool]:
+            """
+            Try to fetch a single URL.
+            Returns:
+                (success, response or None, remaining_delay_seconds, disallowed)
+            """
+            origin = await self._ensure_domain_loaded(u)
+            state = self._domains[origin]
+
+            # Allow/Disallow
+            if not state.matcher.can_fetch(u):
+                self.logger.debug(f"Disallowed by robots.txt: {u}")
+                return False, None, 0.0, True
+
+            self._check_breaker(state, u)
+
+            lock = self._locks.setdefault(origin, asyncio.Lock())
+            min_delay = self._min_delay(origin, state)
+            if min_delay <= 0:
+                return True, await self._request(origin, u, method, timeout, request_kwargs), 0.0, False
+
+            # Rate limiting: hold the origin's lock across the wait and the
+            # request so its schedule is kept without blocking other origins.
+            if not wait and lock.locked():
+                remaining = max(self._remaining_delay(state, min_delay), min_delay)
                 self.logger.info(
-                    f"Loaded robots.txt from {robots_url} (status {r.status_code})"
+                    f"Rate-limited for {remaining:.2f}s on {u}, "
+                    f"wait=False; will consider alternatives."
                 )
-            else:
-                parser.set_url(robots_url)
-                parser.parse([])
-                self.logger.warning(
-                    f"No robots.txt or empty response at {robots_url}; "
-                    "assuming allow with no delay."
+                return False, None, remaining, False
+
+            async with lock:
+                may_send, remaining = await asyncio.to_thread(
+                    self._reserve_slot, origin, state, wait
                 )
-        except requests.RequestException as e:
-            parser.set_url(robots_url)
-            parser.parse([])
+                if not may_send:
+                    self.logger.info(
+                        f"Rate-limited for {remaining:.2f}s on {u}, "
+                        f"wait=False; will consider alternatives."
+                    )
+                    return False, None, remaining, False
+                if remaining > 0:
+                    self.logger.debug(f"Sleeping {remaining:.2f}s before fetching {u}")
+                    await asyncio.sleep(remaining)
+
+                resp = await self._request(origin, u, method, timeout, request_kwargs)
+            return True, resp, 0.0, False
+
+        # First, try the original URL
+        success, resp, remaining, disallowed = await _attempt(url)
+        if success:
+            return resp
+
+        # If disallowed and we have a modifier, try alternatives
+        best_wait: Optional[Tuple[str, float]] = None
+
+        if disallowed and url_modifier is not None:
             self.logger.warning(
-                f"Failed to fetch robots.txt from {robots_url}: {e}. "
-                "Assuming allow with no delay."
+                f"Original URL disallowed: {url}. Trying modified candidates."
             )
 
-        # Compute minimum spacing from Crawl-delay and Request-rate
-        cd = parser.crawl_delay(self.user_agent)
-        rr = parser.request_rate(self.user_agent)
+            for cand in self._candidate_urls(url, url_modifier):
+                self.logger.info(f"Trying candidate URL: {cand}")
+                s, r, rem, d = await _attempt(cand)
+                if s: return r
+                if not d and rem > 0:
+                    if best_wait is None or rem < best_wait[1]:
+                        best_wait = (cand, rem)
 
-        delay_from_cd = float(cd) if cd is not None else 0.0
-        delay_from_rr = 0.0
-        if rr is not None and getattr(rr, "requests", None) and getattr(
-            rr, "seconds", None
-        ):
-            if rr.requests > 0:
-                delay_from_rr = float(rr.seconds) / float(rr.requests)
+        raise self._failure(url, best_wait)
 
-        min_delay = max(delay_from_cd, delay_from_rr, self.default_min_delay)
+    async def fetch_many(
+        self,
+        urls: Iterable[str],
+        max_concurrency: int = 8,
+        **fetch_kwargs,
+    ) -> AsyncIterator[FetchResult]:
+        """
+        Fetch many URLs concurrently, yielding results as they complete.
 
-        self._domains[origin] = _DomainState(
-            parser=parser,
-            min_delay=min_delay,
-            last_request_ts=None,
-        )
-        self.logger.debug(
-            f"Initialized domain state for {origin}: min_delay={min_delay:.2f}s"
-        )
+        Same grouping and error reporting as CustomFetcher.fetch_many, with
+        at most max_concurrency origin queues drained at once.
+        """
+        queues = self._group_by_origin(urls)
+        total = sum(len(q) for q in queues.values())
+        results: "asyncio.Queue[FetchResult]" = asyncio.Queue()
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def _drain(origin: Tuple[str, str, Optional[int]], batch: List[str]) -> None:
+            async with semaphore:
+                for u in batch:
+                    try:
+                        resp = await self.fetch(u, **fetch_kwargs)
+                        await results.put(FetchResult(u, origin, response=resp))
+                    except Exception as e:
+                        self.logger.warning(f"Batch fetch failed for {u}: {e}")
+                        await results.put(FetchResult(u, origin, error=e))
+
+        tasks = [
+            asyncio.create_task(_drain(origin, batch))
+            for origin, batch in queues.items()
+        ]
+        try:
+            for _ in range(total):
+                yield await results.get()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def can_fetch(self, url: str) -> bool:
+        """
+        Whether robots.txt allows fetching the URL, without fetching it.
+        """
+        origin = await self._ensure_domain_loaded(url)
+        return self._domains[origin].matcher.can_fetch(url)
+
+    async def get_min_delay_for(self, url: str) -> float:
+        """
+        Return the computed minimum delay (seconds) for the URL's origin.
+        """
+        origin = await self._ensure_domain_loaded(url)
+        delay = self._domains[origin].min_delay
+        self.logger.debug(f"Min delay for origin {origin}: {delay:.2f}s")
+        return delay
+
+    def close(self) -> None:
+        """
+        Close every per-origin session.
+        """
+        for session in self._sessions.values():
+            session.close()
+        self._sessions.clear()
+
+    def _session_for(self, origin: Tuple[str, str, Optional[int]]) -> requests.Session:
+        session = self._sessions.get(origin)
+        if session is None:
+            session = self._sessions[origin] = self._new_session()
+        return session
+
+    async def _request(
+        self,
+        origin: Tuple[str, str, Optional[int]],
+        u: str,
+        method: str,
+        timeout: Optional[float],
+        request_kwargs: dict,
+    ) -> requests.Response:
+        state = self._domains[origin]
+        attempt = 0
+        while True:
+            self.logger.info(f"Fetching {u}")
+            try:
+                resp = await asyncio.to_thread(
+                    self._send, self._session_for(origin), method, u, timeout, request_kwargs
+                )
+            except requests.RequestException as error:
+                self._record_outcome(state, u, None, error=error)
+                raise
+            finally:
+                # Update last request timestamp
+                state.last_request_ts = time.monotonic()
+            self.logger.debug(
+                f"Fetched {u} with status {resp.status_code}; "
+                f"min_delay={state.min_delay:.2f}s"
+            )
+
+            delay, cooldown = self._retry_delay(resp, attempt, state)
+            if delay is None:
+                break
+            attempt += 1
+            self.logger.warning(
+                f"Got {resp.status_code} for {u}; retry {attempt}/"
+                f"{self.max_retries} in {delay:.2f}s."
+            )
+            await asyncio.sleep(delay)
+            # Retries take a slot like any request, so the shared
+            # per-origin spacing holds for them too.
+            _, remaining = await asyncio.to_thread(self._reserve_slot, origin, state, True)
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+
+        self._finish(state, u, resp, cooldown, attempt)
+        return resp
+
+    async def _ensure_domain_loaded(
+        self, url: str
+    ) -> Tuple[str, str, Optional[int]]:
+        origin = _normalize_origin(url)
+        if origin in self._domains:
+            return origin
+
+        async with self._load_locks.setdefault(origin, asyncio.Lock()):
+            # Another task may have loaded it while we waited.
+            if origin in self._domains:
+                return origin
+
+            cached = await asyncio.to_thread(self._cached_parser, origin)
+            if cached is not None:
+                self._register_domain(origin, *cached)
+                return origin
+
+            base = _origin_to_base_url(origin)
+            robots_url = f"{base.rstrip('/')}/robots.txt"
+
+            try:
+                r = await asyncio.to_thread(
+                    self._session_for(origin).get, robots_url, timeout=self.timeout
+                )
+                parser, lines = self._parse_robots(robots_url, r)
+            except requests.RequestException as e:
+                parser, lines = self._parse_robots(robots_url, None, e)
+
+            state = self._register_domain(origin, parser)
+            await asyncio.to_thread(self._store_cached, origin, lines, state)
         return origin
 
 if __name__ == "__main__":
@@ -310,4 +1094,4 @@ if __name__ == "__main__":
     except RobotsDisallowError as e:
         print(f" Disallowed: {e}")
     except RobotsRateLimitError as e:
-        print(f"Rate-limited: {e}")
\ No newline at end of file
+        print(f"Rate-limited: {e}")
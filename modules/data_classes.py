@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import KW_ONLY, dataclass, field
 from typing import Optional, List
 
 @dataclass
@@ -55,33 +55,36 @@ class SEO:
 @dataclass
 class Artist:
 	name: str
+	_: KW_ONLY
 	smallDescription: Optional[str] = None
 	description: Optional[str] = None
 	profileImage: Optional[Image] = None
 	coverImage: Optional[Image] = None
 	type: str
-	URLs: URLs
-	seo: SEO
+	URLs: URLs = field(default_factory=URLs)
+	seo: SEO = field(default_factory=SEO)
 
 @dataclass
 class Event:
 	name: str
+	_: KW_ONLY
 	smallDescription: Optional[str] = None
 	description: Optional[str] = None
 	coverImage: Optional[Image] = None
 	capacity: Optional[int] = None
-	URLs: URLs
-	servicesAndProperties: ServicesAndProperties
+	URLs: URLs = field(default_factory=URLs)
+	servicesAndProperties: ServicesAndProperties = field(default_factory=ServicesAndProperties)
 	type: Optional[str] = None
 	subType: Optional[str] = None
-	placeLinks: List[str]
+	placeLinks: List[str] = field(default_factory=list)
 	placeId: Optional[int] = None
-	artistLinks: List[List[str]] # Each inside list is for one artist.
-	seo: SEO
+	artistLinks: List[List[str]] = field(default_factory=list) # Each inside list is for one artist.
+	seo: SEO = field(default_factory=SEO)
 
 @dataclass
 class Place:
 	name: str
+	_: KW_ONLY
 	smallDescription: Optional[str] = None
 	description: Optional[str] = None
 	profileImage: Optional[Image] = None
@@ -89,9 +92,9 @@ class Place:
 	type: Optional[str] = None
 	subType: Optional[str] = None
 	capacity: Optional[int] = None
-	URLs: URLs
-	servicesAndProperties: ServicesAndProperties
-	townLinks: List[str]
+	URLs: URLs = field(default_factory=URLs)
+	servicesAndProperties: ServicesAndProperties = field(default_factory=ServicesAndProperties)
+	townLinks: List[str] = field(default_factory=list)
 	townId: Optional[int] = None
 	streetName: Optional[str] = None
 	streetType: Optional[str] = None
@@ -99,26 +102,27 @@ class Place:
 	geoNumber: Optional[str] = None
 	latitude: Optional[float] = None
 	longitude: Optional[float] = None
-	seo: SEO
+	seo: SEO = field(default_factory=SEO)
 
 @dataclass
 class Subevent:
 	name: str
+	_: KW_ONLY
 	smallDescription: Optional[str] = None
 	description: Optional[str] = None
 	coverImage: Optional[Image] = None
 	capacity: Optional[int] = None
-	URLs: URLs
-	servicesAndProperties: ServicesAndProperties
+	URLs: URLs = field(default_factory=URLs)
+	servicesAndProperties: ServicesAndProperties = field(default_factory=ServicesAndProperties)
 	type: Optional[str] = None
 	subType: Optional[str] = None
-	eventLinks: List[str]
+	eventLinks: List[str] = field(default_factory=list)
 	eventId: Optional[int] = None
-	placeLinks: List[str]
+	placeLinks: List[str] = field(default_factory=list)
 	placeId: Optional[int] = None
 	subPlace: Optional[str] = None
-	artistLinks: List[List[str]] # Each inside list is for one artist.
-	seo: SEO
+	artistLinks: List[List[str]] = field(default_factory=list) # Each inside list is for one artist.
+	seo: SEO = field(default_factory=SEO)
 
 if __name__ == "__main__":
 	from dataclasses import asdict
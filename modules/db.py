@@ -1,29 +1,178 @@
-from psycopg2 import connect
+import threading
+import time
+from contextlib import contextmanager
+from psycopg2 import sql, OperationalError, InterfaceError
+from psycopg2.pool import ThreadedConnectionPool
 from modules.custom_logger import CustomLogger
 
-def connect_to_db(dbname: str, user: str, password: str, host: str, port: int):
-	logger = CustomLogger("ConnectToDB")
-
-	# Database connection configuration
-	DB_CONFIG = {
-		"dbname": dbname,
-		"user": user,
-		"password": password,
-		"host": host,
-		"port": port,
-	}
-
-	"""Establish a connection to the database."""
-	try:
-		conn = connect(**DB_CONFIG)
-		logger.info(f"Successfully connected to the database.")
-		return conn
-	except Exception as e:
-		logger.error(f"Error connecting to the database: {e}")
-		exit(1)
-		
-def sanitize_row(row):
-	"""
-	Replace empty strings in the row dictionary with None (NULL in SQL).
-	"""
-	return {key: (value if value != '' else None) for key, value in row.items()}
\ No newline at end of file
+def _with_retry(function, logger: CustomLogger, retries: int = 5, backoff: float = 1.0, max_backoff: float = 30.0):
+	"""
+	Call function, retrying OperationalError (server not up yet, network)
+	with exponential backoff; the last error is raised.
+	"""
+	for attempt in range(retries + 1):
+		try:
+			return function()
+		except OperationalError as e:
+			if attempt == retries:
+				raise
+			delay = min(max_backoff, backoff * 2 ** attempt)
+			logger.warning(f"Connecting to the database failed ({str(e).strip()}), retrying in {delay:.1f}s...")
+			time.sleep(delay)
+
+def row_version(alias: str, column: str | None = None) -> sql.Composable:
+	"""
+	Row version of a table alias: xmin, or the given timestamp column.
+	"""
+	if column is None:
+		return sql.SQL("{}.xmin::text::bigint").format(sql.Identifier(alias))
+	return sql.SQL("{}.{}").format(sql.Identifier(alias), sql.Identifier(column))
+
+def xmin_horizon(cursor) -> int:
+	"""
+	Largest xmin watermark that is safe to store.
+
+	Transactions still running may commit rows with a lower xmin than ones
+	already visible, so a watermark must stay below the oldest of them.
+	xmin is the 32-bit part of the transaction id and wraps around: a stored
+	watermark above the horizon means it wrapped and every row must be read
+	again. Read it before the rows it applies to.
+	"""
+	cursor.execute("SELECT txid_snapshot_xmin(txid_current_snapshot()) % 4294967296 - 1")
+	return cursor.fetchone()[0]
+
+class ConnectionPool:
+	"""
+	Thread-safe pool of reusable connections to one database.
+
+	minconn connections are opened at start and stay open while idle; more
+	are opened on demand up to maxconn and closed when given back. Callers
+	wait for a free connection when all maxconn are in use. A connection
+	idle for more than check_interval seconds is checked with SELECT 1
+	before it is handed out and replaced if it is broken.
+
+	Usage:
+		pool = ConnectionPool(**DB_CONFIG, maxconn=4)
+		with pool.connection() as conn, conn.cursor() as cursor:
+			cursor.execute(...)
+		pool.close()
+	"""
+
+	def __init__(
+		self,
+		dbname: str,
+		user: str,
+		password: str,
+		host: str,
+		port: int,
+		minconn: int = 1,
+		maxconn: int = 5,
+		retries: int = 5,
+		backoff: float = 1.0,
+		check_interval: float = 30.0,
+		timeout: float = 60.0,
+	):
+		"""
+		Parameters:
+			minconn: Connections opened at start and kept idle
+			maxconn: Connections open at most
+			retries: Connect attempts after the first failed one
+			backoff: Seconds before the first retry, doubled per retry
+			check_interval: Idle seconds after which a connection is checked
+			timeout: Seconds to wait for a free connection
+		"""
+		self.logger = CustomLogger("ConnectionPool")
+		self.retries = retries
+		self.backoff = backoff
+		self.check_interval = check_interval
+		self.timeout = timeout
+
+		self._pool = _with_retry(
+			lambda: ThreadedConnectionPool(
+				minconn, maxconn, dbname=dbname, user=user, password=password, host=host, port=port
+			),
+			self.logger, retries, backoff,
+		)
+		# psycopg2's pool raises when exhausted; this makes callers wait.
+		self._slots = threading.BoundedSemaphore(maxconn)
+		# id(connection) -> monotonic time it was returned
+		self._returned_at = {}
+		self.logger.info(f"Connection pool to {host}:{port}/{dbname} ready ({minconn}-{maxconn} connections).")
+
+	def getconn(self):
+		"""
+		A healthy connection; give it back with putconn.
+		"""
+		if not self._slots.acquire(timeout=self.timeout):
+			raise TimeoutError(f"No free database connection after {self.timeout}s.")
+		try:
+			while True:
+				conn = _with_retry(self._pool.getconn, self.logger, self.retries, self.backoff)
+				if self._healthy(conn):
+					return conn
+				self.logger.warning("Discarding a broken pooled connection.")
+				self._returned_at.pop(id(conn), None)
+				self._pool.putconn(conn, close=True)
+		except BaseException:
+			self._slots.release()
+			raise
+
+	def putconn(self, conn, close: bool = False) -> None:
+		"""
+		Give a connection back; open transactions are rolled back.
+		"""
+		try:
+			if not conn.closed and not close:
+				conn.rollback()
+		except (OperationalError, InterfaceError):
+			close = True
+		close = close or bool(conn.closed)
+		if close:
+			self._returned_at.pop(id(conn), None)
+		else:
+			self._returned_at[id(conn)] = time.monotonic()
+		try:
+			self._pool.putconn(conn, close=close)
+		finally:
+			self._slots.release()
+
+	@contextmanager
+	def connection(self):
+		"""
+		Borrow a connection: committed on success, rolled back on error.
+		"""
+		conn = self.getconn()
+		try:
+			yield conn
+			conn.commit()
+		except BaseException:
+			self.putconn(conn)
+			raise
+		self.putconn(conn)
+
+	def close(self) -> None:
+		"""
+		Close every connection of the pool.
+		"""
+		self._pool.closeall()
+		self._returned_at.clear()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def _healthy(self, conn) -> bool:
+		if conn.closed:
+			return False
+		returned_at = self._returned_at.get(id(conn))
+		if returned_at is None or time.monotonic() - returned_at < self.check_interval:
+			return True
+		try:
+			with conn.cursor() as cursor:
+				cursor.execute("SELECT 1")
+			conn.rollback()
+			return True
+		except (OperationalError, InterfaceError):
+			return False
@@ -0,0 +1,304 @@
+"""
+In-memory index of database entities for matching scraped data.
+
+Loads the id, name and platform URL of every row of an entity table
+(places, events, ...) joined to urls once, and answers exact-URL and
+normalized-name lookups from hash maps in O(1). Names are normalized the
+same way on both sides: the " // ..." and " @ ..." suffixes are removed,
+then unidecode, casefold and whitespace collapsing are applied.
+
+refresh() only reloads the entities changed since the last load, using
+a watermark: the row version (xmin) by default, or a timestamp column
+such as updated_at. In xmin mode the watermark never passes the oldest
+transaction still running (see modules.db.xmin_horizon), and a full
+load() is done when transaction ids wrapped around. Deleted entities and deleted or added urls rows
+leave no version behind, so every refresh also reads the (entity id,
+urls id) pairs and reloads the entities whose pairs differ from the
+indexed ones (dropping the deleted ones).
+
+Like MATCH_QUERY of the Tixa report, a name match only accepts entities
+with a urls row without a platform URL; unlike it, names are compared
+in normalized form.
+
+Usage:
+    index = EntityIndex(connection, "places", "place_id", "tixa_url")
+    entity, exact = index.match("Dürer Kert // Budapest", "https://tixa.hu/durerkert")
+    ...
+    index.refresh()
+"""
+from __future__ import annotations
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterator, List, Optional, Tuple
+from psycopg2 import sql
+from unidecode import unidecode
+from modules.custom_logger import CustomLogger
+from modules.db import row_version, xmin_horizon
+from modules.response_cache import normalize_url
+
+_SUFFIX = re.compile(r"\s(@|//).*")
+
+def normalize_name(name: Optional[str]) -> str:
+    """
+    Comparable form of an entity name.
+    """
+    if not name:
+        return ""
+    name = _SUFFIX.sub("", name)
+    return " ".join(unidecode(name).casefold().split())
+
+@dataclass(frozen=True)
+class Entity:
+    id: int
+    name: str
+    url: Optional[str]  # platform URL (e.g. tixa_url), None if not linked
+    url_id: Optional[int] = None  # id of the urls row, None if it has none
+
+    @property
+    def unlinked(self) -> bool:
+        """
+        Has a urls row, but without a platform URL.
+        """
+        return self.url is None and self.url_id is not None
+
+class EntityIndex:
+    """
+    Hash maps of one entity table by platform URL and normalized name.
+    """
+
+    def __init__(
+        self,
+        connection,
+        table: str,
+        fk: str,
+        url_column: str = "tixa_url",
+        watermark_column: Optional[str] = None,
+    ):
+        """
+        Parameters:
+            connection: psycopg2 connection
+            table: Entity table (e.g. "places")
+            fk: Column of urls referencing the table (e.g. "place_id")
+            url_column: Column of urls with the platform URL
+            watermark_column: Timestamp column present on both tables used
+                              to find changed rows; xmin if not given
+        """
+        self.logger = CustomLogger("EntityIndex")
+        self.connection = connection
+        self.table = table
+        self.fk = fk
+        self.url_column = url_column
+        self.watermark_column = watermark_column
+
+        self._by_url: Dict[str, Entity] = {}
+        self._by_name: Dict[str, List[Entity]] = {}
+        # entity id -> its entries (one per urls row, or one without)
+        self._by_id: Dict[int, List[Entity]] = {}
+        # entity id -> ids of its urls rows, as indexed
+        self._pairs: Dict[int, FrozenSet[Optional[int]]] = {}
+        self._watermark = None
+        self._lock = threading.Lock()
+
+        self.load()
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def entities(self) -> Iterator[Entity]:
+        """
+        Every indexed entry (one per urls row, or one if it has none).
+        """
+        for entries in list(self._by_id.values()):
+            yield from entries
+
+    def by_url(self, url: Optional[str]) -> Optional[Entity]:
+        """
+        Entity linked to exactly this platform URL.
+        """
+        if not url:
+            return None
+        return self._by_url.get(normalize_url(url))
+
+    def by_name(self, name: Optional[str]) -> List[Entity]:
+        """
+        Entries whose normalized name equals the normalized name.
+        """
+        return self._by_name.get(normalize_name(name), [])
+
+    def match(self, name: Optional[str], url: Optional[str]) -> Tuple[Optional[Entity], bool]:
+        """
+        Best entity for a scraped (name, url) pair and whether it is linked
+        to that URL. Without a URL match, the first unlinked entity of the
+        same name is returned (exact False).
+        """
+        entity = self.by_url(url)
+        if entity is not None:
+            return entity, True
+        for entity in self.by_name(name):
+            if entity.unlinked:
+                return entity, False
+        return None, False
+
+    def load(self) -> None:
+        """
+        Rebuild the index from the database.
+        """
+        start = time.perf_counter()
+        horizon = self._horizon()
+        rows, watermark = self._fetch()
+        if horizon is not None:
+            # Never past a running transaction; with no rows read, every
+            # later row is newer than the horizon
+            watermark = horizon if watermark is None else min(watermark, horizon)
+        with self._lock:
+            self._by_url.clear()
+            self._by_name.clear()
+            self._by_id.clear()
+            self._pairs.clear()
+            for row in rows:
+                self._add(*row)
+            self._pairs.update(self._pairs_of(rows))
+            self._watermark = watermark
+        self.logger.info(
+            f"Indexed {len(self._by_id)} {self.table} ({len(rows)} rows) "
+            f"in {time.perf_counter() - start:.2f}s."
+        )
+
+    def refresh(self) -> int:
+        """
+        Reload the entities changed since the last load and drop the
+        deleted ones. Returns the number of entities reloaded or dropped.
+        """
+        if self._watermark is None:
+            self.load()
+            return len(self._by_id)
+
+        horizon = self._horizon()
+        if horizon is not None and self._watermark > horizon:
+            self.logger.warning(f"Transaction ids wrapped around since the last load; reloading {self.table}.")
+            self.load()
+            return len(self._by_id)
+
+        rows, watermark = self._fetch(since=self._watermark)
+        changed = {row[0] for row in rows}
+
+        # Deletions and urls rows added or removed, found by their ids
+        pairs = self._current_pairs()
+        deleted = self._pairs.keys() - pairs.keys()
+        moved = {
+            id for id, url_ids in pairs.items()
+            if id not in changed and self._pairs.get(id) != url_ids
+        }
+        if moved:
+            rows += self._fetch(ids=moved)[0]
+            changed |= moved
+
+        with self._lock:
+            for id in changed | deleted:
+                self._remove(id)
+                self._pairs.pop(id, None)
+            for row in rows:
+                self._add(*row)
+            self._pairs.update(self._pairs_of(rows))
+            if watermark is not None:
+                self._watermark = max(self._watermark, watermark)
+            if horizon is not None:
+                self._watermark = min(self._watermark, horizon)
+        if changed or deleted:
+            self.logger.info(f"Refreshed {len(changed)} changed and {len(deleted)} deleted {self.table}.")
+        return len(changed) + len(deleted)
+
+    def _horizon(self) -> Optional[int]:
+        """
+        xmin horizon of the database, None with a watermark column.
+        """
+        if self.watermark_column is not None:
+            return None
+        with self.connection.cursor() as cursor:
+            return xmin_horizon(cursor)
+
+    def _fetch(self, since=None, ids=None) -> Tuple[list, object]:
+        """
+        (entity id, name, platform URL, urls id) rows, all or the ones
+        changed after since or of the given entity ids, and their largest
+        version.
+        """
+        table, fk = sql.Identifier(self.table), sql.Identifier(self.fk)
+        query = sql.SQL("""
+            SELECT entity.id, entity.name, url.{url_column}, url.id,
+                   GREATEST({entity_version}, {url_version})
+            FROM {table} entity
+            LEFT JOIN urls url ON url.{fk} = entity.id
+        """).format(
+            url_column=sql.Identifier(self.url_column),
+            entity_version=row_version("entity", self.watermark_column),
+            url_version=row_version("url", self.watermark_column),
+            table=table,
+            fk=fk,
+        )
+        params = {}
+        if since is not None:
+            query += sql.SQL("""
+                WHERE entity.id IN (
+                    SELECT entity.id FROM {table} entity WHERE {entity_version} > %(since)s
+                    UNION
+                    SELECT url.{fk} FROM urls url WHERE {url_version} > %(since)s
+                )
+            """).format(
+                table=table,
+                fk=fk,
+                entity_version=row_version("entity", self.watermark_column),
+                url_version=row_version("url", self.watermark_column),
+            )
+            params["since"] = since
+        elif ids is not None:
+            query += sql.SQL(" WHERE entity.id = ANY(%(ids)s)")
+            params["ids"] = list(ids)
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(query, params or None)
+            rows = cursor.fetchall()
+
+        versions = [row[4] for row in rows if row[4] is not None]
+        watermark = max(versions) if versions else since
+        return [row[:4] for row in rows], watermark
+
+    def _current_pairs(self) -> Dict[int, FrozenSet[Optional[int]]]:
+        """
+        entity id -> ids of its urls rows, from the database.
+        """
+        query = sql.SQL("""
+            SELECT entity.id, url.id
+            FROM {table} entity
+            LEFT JOIN urls url ON url.{fk} = entity.id
+        """).format(table=sql.Identifier(self.table), fk=sql.Identifier(self.fk))
+        with self.connection.cursor() as cursor:
+            cursor.execute(query)
+            return self._pairs_of(cursor.fetchall(), url_id_column=1)
+
+    @staticmethod
+    def _pairs_of(rows, url_id_column: int = 3) -> Dict[int, FrozenSet[Optional[int]]]:
+        pairs: Dict[int, set] = {}
+        for row in rows:
+            pairs.setdefault(row[0], set()).add(row[url_id_column])
+        return {id: frozenset(url_ids) for id, url_ids in pairs.items()}
+
+    def _add(self, id: int, name: str, url: Optional[str], url_id: Optional[int] = None) -> None:
+        entity = Entity(id, name, url, url_id)
+        self._by_id.setdefault(id, []).append(entity)
+        self._by_name.setdefault(normalize_name(name), []).append(entity)
+        if url:
+            self._by_url[normalize_url(url)] = entity
+
+    def _remove(self, id: int) -> None:
+        for entity in self._by_id.pop(id, []):
+            key = normalize_name(entity.name)
+            same_name = [e for e in self._by_name.get(key, []) if e.id != id]
+            if same_name:
+                self._by_name[key] = same_name
+            else:
+                self._by_name.pop(key, None)
+            if entity.url and self._by_url.get(normalize_url(entity.url)) is entity:
+                del self._by_url[normalize_url(entity.url)]
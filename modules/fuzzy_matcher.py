@@ -0,0 +1,165 @@
+"""
+Fuzzy name matching with trigram blocking.
+
+Comparing every scraped name with every entity name is quadratic. The
+matcher indexes the character trigrams of the normalized entity names
+(see entity_index.normalize_name) in posting lists once. A query only
+looks at the entities that share one of its rarest trigrams (prefix
+filtering): an entity with Jaccard similarity >= threshold must share at
+least ceil(threshold * |query trigrams|) trigrams, so it shares one of the
+|query trigrams| - that + 1 rarest ones. The candidates are then scored
+with the exact trigram Jaccard similarity.
+
+Run this module directly for a benchmark on 100k synthetic names.
+"""
+from __future__ import annotations
+import math
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Hashable, Iterable, List, Optional, Tuple
+from modules.entity_index import normalize_name
+
+def trigrams(name: str) -> FrozenSet[str]:
+    """
+    Trigrams of a normalized name, padded so short names have some.
+    """
+    padded = f"  {name} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+@dataclass(frozen=True)
+class Candidate:
+    id: Hashable
+    name: str
+    score: float  # trigram Jaccard similarity, 0..1
+
+class FuzzyMatcher:
+    """
+    Top-k similar names of a fixed set of entities.
+    """
+
+    def __init__(self, entities: Iterable[Tuple[Hashable, str]], threshold: float = 0.5):
+        """
+        Parameters:
+            entities: (id, name) pairs to search in
+            threshold: Lowest similarity returned by default (0 < threshold <= 1)
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError(f"threshold must be in (0, 1], got {threshold}.")
+        self.threshold = threshold
+
+        self._ids: List[Hashable] = []
+        self._names: List[str] = []
+        self._grams: List[FrozenSet[str]] = []
+        # trigram -> trigram count -> positions of the entities having it
+        self._postings: Dict[str, Dict[int, List[int]]] = {}
+        # trigram -> number of entities having it
+        self._frequency: Dict[str, int] = {}
+
+        for id, name in entities:
+            grams = trigrams(normalize_name(name))
+            position = len(self._ids)
+            self._ids.append(id)
+            self._names.append(name)
+            self._grams.append(grams)
+            for gram in grams:
+                self._postings.setdefault(gram, {}).setdefault(len(grams), []).append(position)
+                self._frequency[gram] = self._frequency.get(gram, 0) + 1
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def search(self, name: str, k: int = 5, threshold: Optional[float] = None) -> List[Candidate]:
+        """
+        Up to k entities with similarity >= threshold, best first.
+        """
+        threshold = self.threshold if threshold is None else threshold
+        query = trigrams(normalize_name(name))
+        size = len(query)
+
+        # Rarest trigrams first; unknown ones cannot produce candidates.
+        ordered = sorted(query, key=lambda gram: self._frequency.get(gram, 0))
+        required = math.ceil(threshold * size)
+        prefix = ordered[:size - required + 1]
+
+        # |B| within [t|A|, |A|/t] is necessary for Jaccard >= t, so only
+        # the postings of those sizes are read.
+        min_size, max_size = threshold * size, size / threshold
+        seen = set()
+        scored = []
+        for gram in prefix:
+            for length, positions in self._postings.get(gram, {}).items():
+                if not min_size <= length <= max_size:
+                    continue
+                for position in positions:
+                    if position in seen:
+                        continue
+                    seen.add(position)
+                    common = len(query & self._grams[position])
+                    score = common / (size + length - common)
+                    if score >= threshold:
+                        scored.append((score, position))
+
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [
+            Candidate(self._ids[position], self._names[position], score)
+            for score, position in scored[:k]
+        ]
+
+    def search_many(self, names: Iterable[str], k: int = 5, threshold: Optional[float] = None) -> List[List[Candidate]]:
+        """
+        search for every name, in order.
+        """
+        return [self.search(name, k, threshold) for name in names]
+
+    def brute_force(self, name: str, k: int = 5, threshold: Optional[float] = None) -> List[Candidate]:
+        """
+        search without blocking, scoring every entity (for comparison).
+        """
+        threshold = self.threshold if threshold is None else threshold
+        query = trigrams(normalize_name(name))
+        scored = []
+        for position, grams in enumerate(self._grams):
+            common = len(query & grams)
+            score = common / (len(query) + len(grams) - common)
+            if score >= threshold:
+                scored.append((score, position))
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        return [
+            Candidate(self._ids[position], self._names[position], score)
+            for score, position in scored[:k]
+        ]
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    random.seed(0)
+    consonants, vowels = "bcdfghjklmnprstvz", "aeiou"
+    words = [
+        "".join(random.choice(consonants) + random.choice(vowels) for _ in range(random.randint(2, 4)))
+        for _ in range(30_000)
+    ]
+    names = [" ".join(random.choice(words) for _ in range(random.randint(1, 4))).title() for _ in range(100_000)]
+
+    def typo(name: str) -> str:
+        position = random.randrange(len(name))
+        return name[:position] + random.choice("aeiouxyz") + name[position + 1:]
+
+    start = time.perf_counter()
+    matcher = FuzzyMatcher(enumerate(names), threshold=0.5)
+    print(f"Indexed {len(matcher)} names in {time.perf_counter() - start:.2f}s")
+
+    queries = [typo(random.choice(names)) for _ in range(1_000)]
+    start = time.perf_counter()
+    results = matcher.search_many(queries, k=5)
+    blocked_time = (time.perf_counter() - start) / len(queries)
+    print(f"Blocked search: {blocked_time * 1000:.2f} ms/query")
+
+    sample = queries[:50]
+    start = time.perf_counter()
+    expected = [matcher.brute_force(query, k=5) for query in sample]
+    brute_time = (time.perf_counter() - start) / len(sample)
+    print(f"Brute force:    {brute_time * 1000:.2f} ms/query ({brute_time / blocked_time:.0f}x slower)")
+
+    assert expected == results[:len(sample)], "Blocking lost candidates"
+    found = sum(1 for result in results if result)
+    print(f"{found}/{len(queries)} misspelled names matched at >= {matcher.threshold}")
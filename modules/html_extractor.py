@@ -0,0 +1,210 @@
+"""
+Lightweight extraction from server-rendered HTML, without a browser.
+
+A single pass of the stdlib HTMLParser collects what the connectors read
+from rendered pages:
+- JSON-LD blocks (flattened, including @graph members)
+- embedded JSON state (<script type="application/json"> with an id,
+  e.g. __NEXT_DATA__)
+- <meta> name/property values and the <title>
+- every element with a data-bind attribute (knockout markup), a tracked
+  class or a tracked tag, with its attributes and text
+
+Usage:
+    page = extract(html, classes={"event-name"})
+    events = page.json_ld_of_type("Event", "MusicEvent")
+    names = page.texts(class_name="event-name")
+"""
+from __future__ import annotations
+import json
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterable, List, Optional
+
+_VOID_TAGS = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input",
+    "link", "meta", "param", "source", "track", "wbr",
+})
+
+@dataclass
+class Element:
+    tag: str
+    attrs: Dict[str, str]
+    text: str = ""
+
+    @property
+    def classes(self) -> List[str]:
+        return self.attrs.get("class", "").split()
+
+@dataclass
+class PageData:
+    title: Optional[str] = None
+    meta: Dict[str, str] = field(default_factory=dict)
+    json_ld: List[dict] = field(default_factory=list)
+    state: Dict[str, Any] = field(default_factory=dict)  # script id -> parsed JSON
+    elements: List[Element] = field(default_factory=list)
+
+    def json_ld_of_type(self, *types: str) -> List[dict]:
+        """
+        JSON-LD objects whose @type is one of types.
+        """
+        wanted = set(types)
+        found = []
+        for item in self.json_ld:
+            item_type = item.get("@type")
+            item_types = item_type if isinstance(item_type, list) else [item_type]
+            if wanted.intersection(t for t in item_types if isinstance(t, str)):
+                found.append(item)
+        return found
+
+    def find(
+        self,
+        tag: Optional[str] = None,
+        class_name: Optional[str] = None,
+        bind: Optional[str] = None,
+        bind_exact: Optional[str] = None,
+    ) -> List[Element]:
+        """
+        Tracked elements matching every given condition; bind matches a
+        substring of data-bind (like [data-bind*=...]), bind_exact the
+        whole attribute (like [data-bind=...]).
+        """
+        result = []
+        for element in self.elements:
+            if tag is not None and element.tag != tag:
+                continue
+            if class_name is not None and class_name not in element.classes:
+                continue
+            data_bind = element.attrs.get("data-bind")
+            if bind is not None and (data_bind is None or bind not in data_bind):
+                continue
+            if bind_exact is not None and data_bind != bind_exact:
+                continue
+            result.append(element)
+        return result
+
+    def texts(self, **conditions) -> List[str]:
+        """
+        Non-empty texts of the elements find(**conditions) returns.
+        """
+        return [element.text for element in self.find(**conditions) if element.text]
+
+class _Extractor(HTMLParser):
+    def __init__(self, classes: Iterable[str], tags: Iterable[str]):
+        super().__init__(convert_charrefs=True)
+        self.page = PageData()
+        self.classes = frozenset(classes)
+        self.tags = frozenset(tags)
+        # Open tracked elements with their collected text parts
+        self._open: List[tuple] = []
+        self._script: Optional[Dict[str, str]] = None
+        self._script_parts: List[str] = []
+        self._in_title = False
+        self._title_parts: List[str] = []
+
+    def _tracked(self, tag: str, attrs: Dict[str, str]) -> bool:
+        if tag in self.tags or "data-bind" in attrs:
+            return True
+        return bool(self.classes) and not self.classes.isdisjoint(attrs.get("class", "").split())
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {key: value or "" for key, value in attrs}
+        if tag == "script":
+            self._script = attrs
+            self._script_parts = []
+            return
+        if tag == "title":
+            self._in_title = True
+        elif tag == "meta":
+            key = attrs.get("property") or attrs.get("name") or attrs.get("itemprop")
+            if key and "content" in attrs:
+                self.page.meta.setdefault(key, attrs["content"])
+
+        if self._tracked(tag, attrs):
+            element = Element(tag, attrs)
+            self.page.elements.append(element)
+            if tag not in _VOID_TAGS:
+                self._open.append((element, []))
+
+    def handle_startendtag(self, tag, attrs):
+        attrs = {key: value or "" for key, value in attrs}
+        if tag == "meta":
+            key = attrs.get("property") or attrs.get("name") or attrs.get("itemprop")
+            if key and "content" in attrs:
+                self.page.meta.setdefault(key, attrs["content"])
+        elif self._tracked(tag, attrs):
+            self.page.elements.append(Element(tag, attrs))
+
+    def handle_endtag(self, tag):
+        if tag == "script" and self._script is not None:
+            self._end_script()
+            return
+        if tag == "title":
+            self._in_title = False
+            self.page.title = " ".join("".join(self._title_parts).split()) or None
+        # Close the innermost open element with this tag (and any unclosed inside it)
+        for index in range(len(self._open) - 1, -1, -1):
+            if self._open[index][0].tag == tag:
+                for element, parts in self._open[index:]:
+                    element.text = " ".join("".join(parts).split())
+                del self._open[index:]
+                break
+
+    def handle_data(self, data):
+        if self._script is not None:
+            self._script_parts.append(data)
+            return
+        if self._in_title:
+            self._title_parts.append(data)
+        for _, parts in self._open:
+            parts.append(data)
+
+    def close(self):
+        super().close()
+        for element, parts in self._open:
+            element.text = " ".join("".join(parts).split())
+        self._open.clear()
+
+    def _end_script(self):
+        attrs, content = self._script, "".join(self._script_parts)
+        self._script = None
+        script_type = attrs.get("type", "").lower()
+        if script_type == "application/ld+json":
+            try:
+                data = json.loads(content)
+            except ValueError:
+                return
+            self._add_json_ld(data)
+        elif script_type == "application/json" and attrs.get("id"):
+            try:
+                self.page.state[attrs["id"]] = json.loads(content)
+            except ValueError:
+                pass
+
+    def _add_json_ld(self, data):
+        if isinstance(data, list):
+            for item in data:
+                self._add_json_ld(item)
+        elif isinstance(data, dict):
+            if "@graph" in data:
+                self._add_json_ld(data["@graph"])
+            if "@type" in data:
+                self.page.json_ld.append(data)
+
+def extract(
+    html: str,
+    classes: Iterable[str] = (),
+    tags: Iterable[str] = ("a", "h1"),
+) -> PageData:
+    """
+    Parse html once and collect its structured data.
+
+    Parameters:
+        html: Page source
+        classes: Elements with any of these classes are tracked
+        tags: Elements with these tags are tracked
+    """
+    parser = _Extractor(classes, tags)
+    parser.feed(html)
+    parser.close()
+    return parser.page
@@ -0,0 +1,147 @@
+"""
+Cross-process per-origin rate limiters for the fetchers.
+
+Without a shared limiter every fetcher process honours Crawl-delay on its
+own, so several scraper containers together exceed it. These backends keep
+the time of the last request per origin outside the process:
+
+- FileRateLimiter: flock-guarded timestamp files, for workers on one host,
+  in rate_limits in the cache directory (see modules.cache_dir) by default
+- PostgresRateLimiter: an advisory lock plus a row in the rate_limits table
+  (see init/initialize.sql), for workers on any host
+
+Slots are reserved when a request starts, so the spacing holds between the
+start of consecutive requests across all workers.
+"""
+from __future__ import annotations
+from abc import ABC, abstractmethod
+import fcntl
+import hashlib
+import os
+import threading
+import time
+from typing import Optional, Tuple
+from modules.cache_dir import cache_path
+from modules.custom_logger import CustomLogger
+
+class RateLimiter(ABC):
+    """
+    Base class of the shared rate limiter backends.
+
+    Keys are origin base URLs (e.g. "https://www.tixa.hu").
+    """
+
+    def __init__(self):
+        self.logger = CustomLogger(type(self).__name__)
+
+    @abstractmethod
+    def reserve(self, origin: str, min_delay: float, wait: bool = True) -> Tuple[bool, float]:
+        """
+        Claim the next request slot for origin.
+
+        Returns (reserved, delay). If reserved, the caller must sleep delay
+        seconds before sending. If wait=False and the next slot is in the
+        future nothing is reserved and delay is the time left until it.
+        """
+
+    @staticmethod
+    def _next_slot(
+        now: float, last: Optional[float], min_delay: float, wait: bool
+    ) -> Tuple[bool, float, float]:
+        """
+        Return (reserved, delay, slot) for the stored last slot.
+        """
+        slot = now if last is None else max(now, last + min_delay)
+        delay = slot - now
+        if delay > 0 and not wait:
+            return False, delay, slot
+        return True, delay, slot
+
+class FileRateLimiter(RateLimiter):
+    """
+    Rate limiter keeping one timestamp file per origin in a directory.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        super().__init__()
+        self.directory = directory or cache_path("rate_limits")
+        os.makedirs(self.directory, exist_ok=True)
+
+    def reserve(self, origin: str, min_delay: float, wait: bool = True) -> Tuple[bool, float]:
+        name = hashlib.sha1(origin.encode("utf-8")).hexdigest()
+        path = os.path.join(self.directory, f"{name}.ts")
+
+        with open(path, "a+", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            raw = f.read().strip()
+            try:
+                last = float(raw) if raw else None
+            except ValueError:
+                self.logger.warning(f"Ignoring corrupt rate limit file {path}.")
+                last = None
+
+            reserved, delay, slot = self._next_slot(time.time(), last, min_delay, wait)
+            if reserved:
+                f.seek(0)
+                f.truncate()
+                f.write(repr(slot))
+                f.flush()
+
+        self.logger.debug(
+            f"Slot for {origin}: reserved={reserved}, delay={delay:.2f}s"
+        )
+        return reserved, delay
+
+class PostgresRateLimiter(RateLimiter):
+    """
+    Rate limiter storing the last slot per origin in the rate_limits table.
+
+    A transaction-level advisory lock on the origin serializes reservations
+    and the database clock is used, so hosts with skewed clocks agree.
+    """
+
+    def __init__(self, connection):
+        super().__init__()
+        self.connection = connection
+        # The connection is shared by fetch_many worker threads.
+        self._lock = threading.Lock()
+
+    def reserve(self, origin: str, min_delay: float, wait: bool = True) -> Tuple[bool, float]:
+        with self._lock:
+            try:
+                with self.connection.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s));", (origin,))
+                    cursor.execute(
+                        """
+                        SELECT
+                              extract(epoch FROM clock_timestamp())
+                            , (SELECT extract(epoch FROM last_request_at)
+                               FROM rate_limits WHERE origin = %s);
+                        """,
+                        (origin,),
+                    )
+                    now, last = cursor.fetchone()
+                    reserved, delay, slot = self._next_slot(
+                        float(now), float(last) if last is not None else None, min_delay, wait
+                    )
+                    if reserved:
+                        cursor.execute(
+                            """
+                            INSERT INTO rate_limits (origin, last_request_at)
+                            VALUES (%s, to_timestamp(%s))
+                            ON CONFLICT (origin) DO UPDATE SET
+                                last_request_at = EXCLUDED.last_request_at;
+                            """,
+                            (origin, slot),
+                        )
+                # Commit releases the advisory lock.
+                self.connection.commit()
+            except Exception:
+                self.connection.rollback()
+                raise
+
+        self.logger.debug(
+            f"Slot for {origin}: reserved={reserved}, delay={delay:.2f}s"
+        )
+        return reserved, delay
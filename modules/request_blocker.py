@@ -0,0 +1,152 @@
+"""
+Request interception for Playwright pages.
+
+The scrapers only read text and links, so images, fonts, media and
+third-party trackers are wasted bandwidth and delay load events
+(networkidle in particular). A RequestBlocker routes every request of a
+page and aborts the ones its allow/deny lists reject.
+
+Per-page counters record allowed and blocked requests, the bytes actually
+transferred (from Content-Length) and an estimate of the bytes saved,
+based on typical sizes per resource type.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional
+from urllib.parse import urlparse
+from modules.custom_logger import CustomLogger
+
+DEFAULT_BLOCKED_TYPES = frozenset({"image", "media", "font", "stylesheet"})
+
+DEFAULT_BLOCKED_DOMAINS = frozenset({
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googlesyndication.com",
+    "doubleclick.net",
+    "facebook.net",
+    "hotjar.com",
+    "clarity.ms",
+    "tiktok.com",
+    "segment.io",
+    "scorecardresearch.com",
+})
+
+# Typical transfer sizes (bytes), used to estimate what blocking saved.
+DEFAULT_SIZE_ESTIMATES = {
+    "image": 40_000,
+    "media": 500_000,
+    "font": 30_000,
+    "stylesheet": 20_000,
+    "script": 30_000,
+    "xhr": 5_000,
+    "fetch": 5_000,
+}
+
+def _matches(host: str, domains: Iterable[str]) -> bool:
+    return any(host == domain or host.endswith("." + domain) for domain in domains)
+
+@dataclass
+class PageStats:
+    url: str = ""
+    allowed_requests: int = 0
+    blocked_requests: int = 0
+    allowed_bytes: int = 0  # Content-Length of allowed responses
+    estimated_bytes_saved: int = 0
+    blocked_by_type: Dict[str, int] = field(default_factory=dict)
+
+    def summary(self) -> str:
+        return (
+            f"{self.url}: blocked {self.blocked_requests} of "
+            f"{self.blocked_requests + self.allowed_requests} requests "
+            f"(~{self.estimated_bytes_saved / 1024:.0f}KB saved, "
+            f"{self.allowed_bytes / 1024:.0f}KB loaded) {self.blocked_by_type}"
+        )
+
+class RequestBlocker:
+    """
+    Aborts unwanted requests of the pages it is attached to.
+
+    Decision order: allowed_domains pass, blocked_domains are aborted,
+    then if allowed_types is set anything else is aborted, otherwise
+    blocked_types are aborted. The document itself is never blocked.
+    """
+
+    def __init__(
+        self,
+        blocked_types: Optional[Iterable[str]] = DEFAULT_BLOCKED_TYPES,
+        allowed_types: Optional[Iterable[str]] = None,
+        blocked_domains: Optional[Iterable[str]] = DEFAULT_BLOCKED_DOMAINS,
+        allowed_domains: Optional[Iterable[str]] = None,
+        size_estimates: Optional[Dict[str, int]] = None,
+    ):
+        """
+        Parameters:
+            blocked_types: Playwright resource types to abort
+            allowed_types: If set, only these resource types are loaded
+            blocked_domains: Hosts (and their subdomains) to abort
+            allowed_domains: Hosts always loaded, whatever their type
+            size_estimates: Bytes per resource type for the saved estimate
+        """
+        self.logger = CustomLogger("RequestBlocker")
+        self.blocked_types = frozenset(blocked_types or ())
+        self.allowed_types = frozenset(allowed_types) if allowed_types is not None else None
+        self.blocked_domains = frozenset(blocked_domains or ())
+        self.allowed_domains = frozenset(allowed_domains or ())
+        self.size_estimates = size_estimates if size_estimates is not None else DEFAULT_SIZE_ESTIMATES
+
+        # Totals over every attached page
+        self.totals = PageStats(url="total")
+
+    def should_block(self, url: str, resource_type: str) -> bool:
+        """
+        Whether a request of this type to this URL gets aborted.
+        """
+        if resource_type == "document":
+            return False
+        host = (urlparse(url).hostname or "").lower()
+        if _matches(host, self.allowed_domains):
+            return False
+        if _matches(host, self.blocked_domains):
+            return True
+        if self.allowed_types is not None:
+            return resource_type not in self.allowed_types
+        return resource_type in self.blocked_types
+
+    async def attach(self, page) -> PageStats:
+        """
+        Start intercepting the page's requests; returns its live counters.
+        """
+        stats = PageStats()
+
+        async def _route(route):
+            request = route.request
+            if self.should_block(request.url, request.resource_type):
+                saved = self.size_estimates.get(request.resource_type, 0)
+                for counters in (stats, self.totals):
+                    counters.blocked_requests += 1
+                    counters.estimated_bytes_saved += saved
+                    counters.blocked_by_type[request.resource_type] = (
+                        counters.blocked_by_type.get(request.resource_type, 0) + 1
+                    )
+                await route.abort("blockedbyclient")
+            else:
+                for counters in (stats, self.totals):
+                    counters.allowed_requests += 1
+                await route.continue_()
+
+        def _response(response) -> None:
+            try:
+                size = int(response.headers.get("content-length", 0))
+            except ValueError:
+                size = 0
+            stats.allowed_bytes += size
+            self.totals.allowed_bytes += size
+
+        def _navigated(frame) -> None:
+            if frame == page.main_frame:
+                stats.url = frame.url
+
+        await page.route("**/*", _route)
+        page.on("response", _response)
+        page.on("framenavigated", _navigated)
+        return stats
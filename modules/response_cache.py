@@ -0,0 +1,258 @@
+"""
+On-disk HTTP response cache for conditional re-fetches.
+
+Bodies are stored per normalized URL together with their ETag and
+Last-Modified validators. The fetchers send If-None-Match and
+If-Modified-Since with the next GET and serve the stored body on a
+304 Not Modified, so unchanged pages only cost a header round-trip.
+
+The cache is bounded by total body size and evicts least recently used
+entries first. A hit is a body served on 304, a miss a full response; the
+counters are kept per instance. Bodies are kept in response_cache in the
+cache directory (see modules.cache_dir) by default.
+"""
+from __future__ import annotations
+import atexit
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+from modules.cache_dir import cache_path
+from modules.custom_logger import CustomLogger
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# Headers describing the raw transfer, not the decoded body we store.
+_SKIPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+def normalize_url(url: str) -> str:
+    """
+    Canonical form of a URL used as cache key.
+
+    Lowercases scheme and host, drops default ports and the fragment and
+    sorts the query parameters.
+    """
+    parsed = urlparse(url)
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or "").lower()
+    port = parsed.port
+    if port is not None and (scheme, port) not in {("http", 80), ("https", 443)}:
+        host = f"{host}:{port}"
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse((scheme, host, parsed.path or "/", parsed.params, query, ""))
+
+@dataclass
+class _CacheEntry:
+    url: str
+    filename: str
+    size: int
+    headers: Dict[str, str]
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    stored_at: float = 0.0
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache of GET response bodies on disk.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        max_bytes: int = 256 * 1024 * 1024,
+    ):
+        self.logger = CustomLogger("ResponseCache")
+        self.directory = directory or cache_path("response_cache")
+        self.max_bytes = int(max_bytes)
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        self._index_path = os.path.join(self.directory, "index.json")
+        # key -> entry, least recently used first
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._total_bytes = 0
+        self._unsaved = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+        atexit.register(self.flush)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Counters and current size of the cache.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+        }
+
+    def flush(self) -> None:
+        """
+        Persist the index (LRU order and refreshed validators).
+        """
+        with self._lock:
+            if self._unsaved:
+                self._save_index()
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """
+        If-None-Match / If-Modified-Since headers for a cached URL.
+        """
+        with self._lock:
+            entry = self._entries.get(normalize_url(url))
+        if entry is None:
+            return {}
+
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def not_modified(self, url: str, response: requests.Response) -> Optional[requests.Response]:
+        """
+        Turn a 304 response into the cached full response.
+
+        Returns None if the body is no longer cached; the caller should
+        then repeat the request unconditionally.
+        """
+        key = normalize_url(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            try:
+                with open(os.path.join(self.directory, entry.filename), "rb") as f:
+                    body = f.read()
+            except OSError:
+                self._drop(key)
+                return None
+
+            # Validators may be refreshed by the 304.
+            entry.etag = response.headers.get("ETag", entry.etag)
+            entry.last_modified = response.headers.get("Last-Modified", entry.last_modified)
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self._touch()
+
+        cached = requests.Response()
+        cached.status_code = 200
+        cached.reason = "OK"
+        cached.url = response.url or url
+        cached.request = response.request
+        cached.headers = CaseInsensitiveDict(entry.headers)
+        cached.encoding = get_encoding_from_headers(cached.headers)
+        cached._content = body
+        cached.from_cache = True
+        self.logger.debug(f"Served {url} from cache (304).")
+        return cached
+
+    def store(self, url: str, response: requests.Response) -> None:
+        """
+        Record a full response; only responses with validators are kept.
+        """
+        with self._lock:
+            self.misses += 1
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if response.status_code != 200 or not (etag or last_modified):
+            return
+
+        body = response.content
+        if len(body) > self.max_bytes:
+            return
+
+        key = normalize_url(url)
+        entry = _CacheEntry(
+            url=key,
+            filename=hashlib.sha256(key.encode("utf-8")).hexdigest(),
+            size=len(body),
+            headers={
+                k: v for k, v in response.headers.items()
+                if k.lower() not in _SKIPPED_HEADERS
+            },
+            etag=etag,
+            last_modified=last_modified,
+            stored_at=time.time(),
+        )
+
+        with self._lock:
+            self._write_atomic(os.path.join(self.directory, entry.filename), body)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total_bytes -= old.size
+            self._entries[key] = entry
+            self._total_bytes += entry.size
+            self.stores += 1
+            self._evict()
+            self._touch()
+
+    def _touch(self, every: int = 50) -> None:
+        # Rewriting the index on every hit would cost more than the hit.
+        self._unsaved += 1
+        if self._unsaved >= every:
+            self._save_index()
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes and self._entries:
+            key = next(iter(self._entries))
+            self._drop(key)
+            self.evictions += 1
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry.size
+        try:
+            os.remove(os.path.join(self.directory, entry.filename))
+        except OSError:
+            pass
+
+    def _load_index(self) -> None:
+        try:
+            with open(self._index_path, encoding="utf-8") as f:
+                raw = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable cache index {self._index_path}: {e}")
+            return
+
+        # The index is saved in LRU order.
+        for value in raw:
+            entry = _CacheEntry(**value)
+            if os.path.exists(os.path.join(self.directory, entry.filename)):
+                self._entries[entry.url] = entry
+                self._total_bytes += entry.size
+        self._evict()
+        self.logger.info(
+            f"Loaded response cache with {len(self._entries)} entries "
+            f"({self._total_bytes} bytes)."
+        )
+
+    def _save_index(self) -> None:
+        data = json.dumps([asdict(entry) for entry in self._entries.values()])
+        self._write_atomic(self._index_path, data.encode("utf-8"))
+        self._unsaved = 0
+
+    def _write_atomic(self, path: str, data: bytes) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
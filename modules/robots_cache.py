@@ -0,0 +1,189 @@
+"""
+Persistent robots.txt cache shared between fetcher instances.
+
+Stores the raw robots.txt lines, the computed minimum delay and the fetch
+time per origin, so a freshly started container can skip the robots.txt
+round-trip while the entry is younger than the TTL.
+
+Backends:
+- FileRobotsCache: a JSON file, safe for several processes on one host,
+  robots_cache.json in the cache directory (see modules.cache_dir) by default
+- PostgresRobotsCache: the robots_cache table (see init/initialize.sql)
+"""
+from __future__ import annotations
+from abc import ABC, abstractmethod
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+from modules.cache_dir import cache_path
+from modules.custom_logger import CustomLogger
+
+@dataclass
+class RobotsCacheEntry:
+    lines: List[str]
+    min_delay: float  # seconds, computed for user_agent
+    fetched_at: float  # unix timestamp
+    user_agent: str
+
+class RobotsCache(ABC):
+    """
+    Base class of the robots.txt cache backends.
+
+    Keys are origin base URLs (e.g. "https://www.tixa.hu").
+    """
+
+    def __init__(self, ttl: float = 24 * 3600.0):
+        self.logger = CustomLogger(type(self).__name__)
+        self.ttl = float(ttl)
+
+    @abstractmethod
+    def get(self, origin: str) -> Optional[RobotsCacheEntry]:
+        """
+        Return the cached entry for origin, or None if missing or expired.
+        """
+
+    @abstractmethod
+    def put(self, origin: str, entry: RobotsCacheEntry) -> None:
+        """
+        Store (or replace) the entry for origin.
+        """
+
+    def _is_fresh(self, entry: RobotsCacheEntry) -> bool:
+        return time.time() - entry.fetched_at < self.ttl
+
+class FileRobotsCache(RobotsCache):
+    """
+    robots.txt cache kept in a single JSON file.
+
+    Writes take an exclusive flock on a sidecar lock file and replace the
+    JSON atomically, so readers never see a half-written file.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl: float = 24 * 3600.0):
+        super().__init__(ttl)
+        self.path = path or cache_path("robots_cache.json")
+        self._entries: Dict[str, RobotsCacheEntry] = {}
+        self._mtime: Optional[float] = None
+
+    def get(self, origin: str) -> Optional[RobotsCacheEntry]:
+        self._reload()
+        entry = self._entries.get(origin)
+        if entry is None or not self._is_fresh(entry):
+            return None
+        return entry
+
+    def put(self, origin: str, entry: RobotsCacheEntry) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+
+        with open(f"{self.path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            # Merge with whatever other processes wrote meanwhile.
+            self._reload(force=True)
+            self._entries[origin] = entry
+            now = time.time()
+            data = {
+                key: asdict(value)
+                for key, value in self._entries.items()
+                if now - value.fetched_at < self.ttl
+            }
+
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        self.logger.debug(f"Cached robots.txt for {origin} in {self.path}.")
+
+    def _reload(self, force: bool = False) -> None:
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+        if not force and mtime == self._mtime:
+            return
+
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                raw = json.load(f)
+            self._entries = {
+                key: RobotsCacheEntry(**value) for key, value in raw.items()
+            }
+            self._mtime = mtime
+        except (OSError, ValueError, TypeError) as e:
+            self.logger.warning(f"Ignoring unreadable robots cache {self.path}: {e}")
+
+class PostgresRobotsCache(RobotsCache):
+    """
+    robots.txt cache kept in the robots_cache table.
+    """
+
+    def __init__(self, connection, ttl: float = 24 * 3600.0):
+        super().__init__(ttl)
+        self.connection = connection
+        # The connection is shared by fetch_many worker threads.
+        self._lock = threading.Lock()
+
+    def get(self, origin: str) -> Optional[RobotsCacheEntry]:
+        with self._lock:
+            try:
+                with self.connection.cursor() as cursor:
+                    cursor.execute(
+                        """
+                        SELECT content, min_delay, extract(epoch FROM fetched_at), user_agent
+                        FROM robots_cache
+                        WHERE origin = %s
+                          AND fetched_at > now() - make_interval(secs => %s);
+                        """,
+                        (origin, self.ttl),
+                    )
+                    row = cursor.fetchone()
+                self.connection.commit()
+            except Exception:
+                self.connection.rollback()
+                raise
+
+        if row is None:
+            return None
+        content, min_delay, fetched_at, user_agent = row
+        return RobotsCacheEntry(
+            lines=content.splitlines(),
+            min_delay=float(min_delay),
+            fetched_at=float(fetched_at),
+            user_agent=user_agent,
+        )
+
+    def put(self, origin: str, entry: RobotsCacheEntry) -> None:
+        with self._lock:
+            self._put(origin, entry)
+        self.logger.debug(f"Cached robots.txt for {origin} in the database.")
+
+    def _put(self, origin: str, entry: RobotsCacheEntry) -> None:
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO robots_cache (origin, user_agent, content, min_delay, fetched_at)
+                    VALUES (%s, %s, %s, %s, to_timestamp(%s))
+                    ON CONFLICT (origin) DO UPDATE SET
+                          user_agent = EXCLUDED.user_agent
+                        , content = EXCLUDED.content
+                        , min_delay = EXCLUDED.min_delay
+                        , fetched_at = EXCLUDED.fetched_at;
+                    """,
+                    (
+                        origin,
+                        entry.user_agent,
+                        "\n".join(entry.lines),
+                        entry.min_delay,
+                        entry.fetched_at,
+                    ),
+                )
+            self.connection.commit()
+        except Exception:
+            self.connection.rollback()
+            raise
@@ -0,0 +1,147 @@
+"""
+Precompiled robots.txt rule matcher.
+
+RobotFileParser.can_fetch walks every rule of the matching entry for each
+URL. RobotsMatcher compiles the rules of the entry that applies to one
+user agent into a prefix trie once, then answers each check by walking the
+URL path, independent of the number of rules.
+
+The answers are the same as RobotFileParser's:
+- the first rule (in file order) whose path is a prefix of the URL wins
+- a rule path of "*" matches everything
+- URLs are normalized exactly like can_fetch does (unquote, drop scheme
+  and host, quote)
+
+Note that the stdlib parser has no pattern wildcards: "*" and "$" inside a
+path are matched literally (after quoting), and so they are here.
+
+Run this module directly for a micro-benchmark against the stdlib parser.
+"""
+from __future__ import annotations
+import urllib.parse
+from typing import Dict, List, Optional
+from urllib.robotparser import RobotFileParser
+
+_NO_RULE = float("inf")
+
+class _Node:
+    __slots__ = ("children", "rule", "best")
+
+    def __init__(self):
+        self.children: Dict[str, _Node] = {}
+        self.rule: float = _NO_RULE  # index of the first rule ending here
+        self.best: float = _NO_RULE  # smallest rule index in this subtree
+
+class RobotsMatcher:
+    """
+    can_fetch for one user agent, compiled from a parsed robots.txt.
+    """
+
+    def __init__(self, parser: RobotFileParser, user_agent: str):
+        self.user_agent = user_agent
+        self.disallow_all = parser.disallow_all
+        self.allow_all = parser.allow_all
+        self.loaded = bool(parser.last_checked)
+
+        entry = None
+        for candidate in parser.entries:
+            if candidate.applies_to(user_agent):
+                entry = candidate
+                break
+        if entry is None:
+            entry = parser.default_entry
+
+        self._allowances: List[bool] = []
+        self._star: float = _NO_RULE
+        self._root = _Node()
+        if entry is not None:
+            for index, line in enumerate(entry.rulelines):
+                self._allowances.append(line.allowance)
+                if line.path == "*":
+                    self._star = min(self._star, index)
+                self._insert(line.path, index)
+
+    def can_fetch(self, url: str) -> bool:
+        """
+        Same result as RobotFileParser.can_fetch(user_agent, url).
+        """
+        if self.disallow_all:
+            return False
+        if self.allow_all:
+            return True
+        if not self.loaded:
+            return False
+        if not self._allowances:
+            return True
+
+        parsed_url = urllib.parse.urlparse(urllib.parse.unquote(url))
+        url = urllib.parse.urlunparse(('', '', parsed_url.path,
+            parsed_url.params, parsed_url.query, parsed_url.fragment))
+        url = urllib.parse.quote(url)
+        if not url:
+            url = "/"
+
+        index = self._first_match(url)
+        if index == _NO_RULE:
+            return True
+        return self._allowances[int(index)]
+
+    def _insert(self, path: str, index: int) -> None:
+        node = self._root
+        node.best = min(node.best, index)
+        for char in path:
+            child = node.children.get(char)
+            if child is None:
+                child = node.children[char] = _Node()
+            node = child
+            node.best = min(node.best, index)
+        node.rule = min(node.rule, index)
+
+    def _first_match(self, url: str) -> float:
+        best = min(self._star, self._root.rule)
+        node: Optional[_Node] = self._root
+        for char in url:
+            node = node.children.get(char)
+            # Stop when no deeper rule can beat the match we have.
+            if node is None or node.best >= best:
+                break
+            if node.rule < best:
+                best = node.rule
+        return best
+
+if __name__ == "__main__":
+    import random
+    import time
+
+    random.seed(0)
+    sections = ["event", "events", "location", "city", "a", "e", "v", "search", "api", "user"]
+    lines = ["User-agent: *"]
+    for i in range(400):
+        rule = "Allow" if i % 7 == 0 else "Disallow"
+        lines.append(f"{rule}: /{random.choice(sections)}/{i}{random.choice(['', '/', '?q='])}")
+    lines += ["Disallow: /private", "Allow: /"]
+
+    parser = RobotFileParser()
+    parser.parse(lines)
+    user_agent = "DemoBot/1.0"
+    matcher = RobotsMatcher(parser, user_agent)
+
+    urls = [
+        f"https://example.com/{random.choice(sections)}/{random.randint(0, 800)}/"
+        f"{random.choice(['', 'tickets', 'details?id=3'])}"
+        for _ in range(20_000)
+    ]
+
+    start = time.perf_counter()
+    expected = [parser.can_fetch(user_agent, url) for url in urls]
+    stdlib_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [matcher.can_fetch(url) for url in urls]
+    matcher_time = time.perf_counter() - start
+
+    assert expected == actual, "RobotsMatcher disagrees with RobotFileParser"
+    print(f"{len(urls)} URLs, {len(lines) - 1} rules")
+    print(f"RobotFileParser.can_fetch: {stdlib_time * 1e6 / len(urls):.2f} us/URL")
+    print(f"RobotsMatcher.can_fetch:   {matcher_time * 1e6 / len(urls):.2f} us/URL")
+    print(f"Speedup: {stdlib_time / matcher_time:.1f}x")
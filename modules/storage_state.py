@@ -0,0 +1,99 @@
+"""
+On-disk store of Playwright storage state (cookies and localStorage).
+
+A fresh browser context starts without cookies, so every scrape sees the
+cookie banner and the anti-bot first-visit checks again. The store keeps
+the storage state of the last successful scrape per origin, together with
+the emulated device it was made with (anti-bot cookies are tied to the
+user agent), and hands it to the next context until it expires.
+
+The files hold session cookies: by default they are kept in
+storage_state under the cache directory (see modules.cache_dir), readable
+by the owner only.
+
+Usage:
+    store = StorageStateStore(ttl=6 * 3600)
+    saved = store.load("https://www.ticketswap.com")
+    async with pool.page(device=saved.device, storage_state=saved.state) as page:
+        ...
+        store.save("https://www.ticketswap.com", await page.context.storage_state(), saved.device)
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Optional
+from modules.cache_dir import cache_path
+from modules.custom_logger import CustomLogger
+
+@dataclass
+class StoredState:
+    state: dict  # as returned by BrowserContext.storage_state()
+    device: Optional[str]
+    saved_at: float
+
+class StorageStateStore:
+    """
+    One JSON file of storage state per origin in a directory.
+    """
+
+    def __init__(self, directory: Optional[str] = None, ttl: float = 6 * 3600):
+        """
+        Parameters:
+            directory: Where the state files are kept, storage_state in
+                       the cache directory if not given
+            ttl: Seconds a saved state is reused
+        """
+        self.logger = CustomLogger("StorageStateStore")
+        self.directory = directory or cache_path("storage_state")
+        self.ttl = ttl
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+    def load(self, origin: str) -> Optional[StoredState]:
+        """
+        Saved state of origin, or None if missing, expired or unreadable.
+        """
+        path = self._path(origin)
+        try:
+            with open(path, encoding="utf-8") as f:
+                raw = json.load(f)
+            stored = StoredState(raw["state"], raw.get("device"), float(raw["saved_at"]))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.logger.warning(f"Ignoring unreadable storage state {path}: {e}")
+            return None
+
+        age = time.time() - stored.saved_at
+        if age > self.ttl:
+            self.logger.debug(f"Storage state of {origin} expired {age - self.ttl:.0f}s ago.")
+            return None
+        return stored
+
+    def save(self, origin: str, state: dict, device: Optional[str] = None) -> None:
+        """
+        Replace the saved state of origin.
+        """
+        data = json.dumps({"state": state, "device": device, "saved_at": time.time()})
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(origin))
+        self.logger.debug(f"Saved storage state of {origin}.")
+
+    def invalidate(self, origin: str) -> None:
+        """
+        Forget the saved state of origin (e.g. after an anti-bot block).
+        """
+        try:
+            os.remove(self._path(origin))
+            self.logger.info(f"Invalidated storage state of {origin}.")
+        except FileNotFoundError:
+            pass
+
+    def _path(self, origin: str) -> str:
+        name = hashlib.sha1(origin.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.json")
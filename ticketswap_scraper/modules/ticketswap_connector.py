@@ -2,25 +2,200 @@
 Logics regarding scraping data from ticketswap.com.
 """
 
+import asyncio
+import json
 from random import choice
-from urllib.parse import urlparse
-from playwright.sync_api import sync_playwright
+from typing import Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urljoin, urlparse
+from modules.adaptive_throttle import BLOCKED, AdaptiveThrottle
+from modules.browser_pool import BrowserPool
 from modules.custom_logger import CustomLogger
+from modules.request_blocker import RequestBlocker
+from modules.storage_state import StorageStateStore
 from modules.data_classes import Event, URLs
-from typing import List
+
+DEVICES = [
+	"iPhone 11", "iPhone 11 Pro", "iPhone 11 Pro Max",
+	"iPhone 12", "iPhone 12 Pro", "iPhone 12 Pro Max",
+	"iPhone 13", "iPhone 13 Pro", "iPhone 13 Pro Max",
+	"iPhone 14", "iPhone 14 Pro", "iPhone 14 Pro Max",
+	"iPhone 15", "iPhone 15 Max", "iPhone 15 Pro", "iPhone 15 Pro Max",
+]
+
+# Hide webdriver flag
+STEALTH_SCRIPT = """
+	// hide webdriver
+	Object.defineProperty(navigator, 'webdriver', {get:() => false});
+	// mock Chrome object
+	window.chrome = { runtime: {} };
+	// fake plugins
+	Object.defineProperty(navigator, 'plugins', {
+	  get: () => [1,2,3,4,5]
+	});
+	// fake languages
+	Object.defineProperty(navigator, 'languages', {
+	  get: () => ['en-US','en']
+	});
+"""
+
+BASE_URL = "https://www.ticketswap.com"
+
+# Reads the fields of all event cards in a single round-trip.
+EXTRACT_CARDS_SCRIPT = """
+	cards => cards.map(card => {
+		const text = selector => {
+			const element = card.querySelector(selector);
+			return element ? element.innerText.trim() : null;
+		};
+		return {
+			name: text("h4"),
+			place: text("h5"),
+			href: card.getAttribute("href"),
+		};
+	})
+"""
+
+def card_to_event(card: dict) -> Optional[Event]:
+	"""
+	Make an Event of a card returned by EXTRACT_CARDS_SCRIPT.
+	Cards without a name (e.g. placeholders) are skipped.
+	"""
+	if not card.get("name"):
+		return None
+	return Event(
+		card["name"],
+		placeLinks=[card["place"]] if card.get("place") else [],
+		URLs=URLs(
+			ticketswapURL=urljoin(BASE_URL, card.get("href") or "")
+		),
+	)
+
+CARD = "a[href*='/event/']"
+SHOW_MORE = "button:has-text('Show more')"
+
+# Responses whose URL contains this are inspected in "api" mode.
+API_URL_PATTERN = "graphql"
+
+def _connections(payload) -> Iterator[Tuple[list, dict]]:
+	"""
+	Yield (nodes, pageInfo) of every GraphQL connection in a payload.
+	"""
+	if isinstance(payload, dict):
+		page_info = payload.get("pageInfo")
+		if isinstance(page_info, dict):
+			if isinstance(payload.get("edges"), list):
+				yield [edge.get("node") for edge in payload["edges"] if isinstance(edge, dict)], page_info
+			elif isinstance(payload.get("nodes"), list):
+				yield payload["nodes"], page_info
+		for value in payload.values():
+			yield from _connections(value)
+	elif isinstance(payload, list):
+		for value in payload:
+			yield from _connections(value)
+
+def _node_place(node: dict) -> Optional[str]:
+	"""
+	Place of an event node: its location's page URL, else its name.
+	"""
+	place = node.get("location") or node.get("venue")
+	if isinstance(place, dict):
+		link = place.get("url") or place.get("uri") or place.get("slug")
+		if isinstance(link, str) and link:
+			return urljoin(BASE_URL, link)
+		place = place.get("name")
+	return place.strip() if isinstance(place, str) and place.strip() else None
+
+def node_to_event(node) -> Optional[Event]:
+	"""
+	Make an Event of an event node of an API payload.
+	Nodes that do not link to an event page are skipped.
+	"""
+	if not isinstance(node, dict):
+		return None
+	name = node.get("name") or node.get("title")
+	link = node.get("url") or node.get("uri") or node.get("slug")
+	if isinstance(link, dict):
+		link = link.get("url") or link.get("path")
+	if not name or not isinstance(link, str) or "/event/" not in link:
+		return None
+	place = _node_place(node)
+	return Event(
+		name.strip(),
+		placeLinks=[place] if place else [],
+		URLs=URLs(
+			ticketswapURL=urljoin(BASE_URL, link)
+		),
+	)
+
+def _with_cursor(variables, cursor: str) -> Tuple[dict, bool]:
+	"""
+	Copy of GraphQL variables with the pagination cursor replaced.
+	Returns whether a cursor variable was found.
+	"""
+	if not isinstance(variables, dict):
+		return variables, False
+	found = False
+	result = {}
+	for key, value in variables.items():
+		if key in ("after", "cursor"):
+			result[key] = cursor
+			found = True
+		else:
+			result[key], nested = _with_cursor(value, cursor)
+			found = found or nested
+	return result, found
 
 class TicketSwapConnector:
 	"""
 	Connector class to get data from scraping 
 	"""
-	def __init__(self, headless=True):
+	def __init__(
+		self,
+		headless=True,
+		pool: Optional[BrowserPool] = None,
+		blocker: Optional[RequestBlocker] = None,
+		mode: str = "dom",
+		max_api_pages: int = 100,
+		storage: Optional[StorageStateStore] = None,
+		persist_state: bool = True,
+		throttle: Optional[AdaptiveThrottle] = None,
+	):
 		"""
 		Init function make TicketSwapConnector class.
+		pool: shared BrowserPool, a private one is made if not given.
+		blocker: request filter, by default images, media, fonts and
+		         trackers are not loaded. Stylesheets are kept so the
+		         page looks like a normal visit to the anti-bot checks.
+		mode: "dom" presses 'Show more' until the list is complete,
+		      "api" replays the GraphQL request behind the list with the
+		      next cursor instead, falling back to "dom" if no such
+		      request is seen.
+		max_api_pages: Upper limit of replayed requests in "api" mode.
+		storage: where cookies and localStorage are kept between runs,
+		         a StorageStateStore in the cache directory (see
+		         modules.cache_dir) if not given.
+		persist_state: reuse the state (and device) of the last
+		               successful scrape, so warm runs skip the cookie
+		               banner; it is dropped when anti-bot kicks in.
+		throttle: adaptive pace (concurrent pages and delay between
+		          them), slowed down sharply on anti-bot pages and
+		          timeouts; a private one is made if not given.
 		"""
+		if mode not in ("dom", "api"):
+			raise ValueError(f"Unknown mode: {mode!r} (expected 'dom' or 'api').")
 		self.logger = CustomLogger("TicketswapConnector")
 		self.headless = headless
+		self.mode = mode
+		self.max_api_pages = max_api_pages
+		self.storage = storage if storage is not None or not persist_state else StorageStateStore()
+		self.throttle = throttle if throttle is not None else AdaptiveThrottle()
+		self.blocker = blocker if blocker is not None else RequestBlocker(
+			blocked_types={"image", "media", "font"}
+		)
+		self.pool = pool if pool is not None else BrowserPool(size=1, headless=headless)
+		self._owns_pool = pool is None
 	
-	def __call__(self, url: str):
+	async def __call__(self, url: str):
 		"""
 		Run scrape logic for a URL on call.
 		"""
@@ -34,157 +209,278 @@ class TicketSwapConnector:
 		match path[1]:
 			case "event": 
 				self.logger.info("Using event scraping method.")
-				return self.scrape_event(url._replace(fragment="").geturl())
+				return await self.scrape_event(url._replace(fragment="").geturl())
 			case "location": 
 				self.logger.info("Using venue scraping method.")
-				return self.scrape_venue(url._replace(fragment="").geturl())
+				return await self.scrape_venue(url._replace(fragment="").geturl())
 			case "city": 
 				self.logger.info("Using city scraping method.")
-				return self.scrape_city(url._replace(fragment="").geturl())
+				return await self.scrape_city(url._replace(fragment="").geturl())
+
+	async def close(self):
+		"""
+		Close the browser pool if this connector made it.
+		"""
+		self.logger.info(f"Throttle limits: {self.throttle.snapshot()}")
+		if self._owns_pool:
+			await self.pool.close()
 	
-	def __scrape(self, callback):
+	async def __scrape(self, callback):
 		"""
 		Function to load url and returns page from it.
+		The callback gets the page and whether a saved state was
+		restored, and returns (events, blocked by anti-bot).
 		"""
-		with sync_playwright() as p:
-			browser = p.chromium.launch(
-				headless=self.headless,
-                args=["--disable-blink-features=AutomationControlled"]
-			)
-
-			devices = [
-				"iPhone 11", "iPhone 11 Pro", "iPhone 11 Pro Max",
-				"iPhone 12", "iPhone 12 Pro", "iPhone 12 Pro Max",
-				"iPhone 13", "iPhone 13 Pro", "iPhone 13 Pro Max",
-				"iPhone 14", "iPhone 14 Pro", "iPhone 14 Pro Max",
-				"iPhone 15", "iPhone 15 Max", "iPhone 15 Pro", "iPhone 15 Pro Max",
-			]
-			device = p.devices[choice(devices)]
-			context = browser.new_context(
-				**device,
-                locale="en-US",
-                timezone_id="Europe/Budapest",
-                extra_http_headers={
-                  "accept-language": "en-US,en;q=0.9"
-                }
-			)
-
-			# Hide webdriver flag
-			context.add_init_script("""
-                // hide webdriver
-                Object.defineProperty(navigator, 'webdriver', {get:() => false});
-                // mock Chrome object
-                window.chrome = { runtime: {} };
-                // fake plugins
-                Object.defineProperty(navigator, 'plugins', {
-                  get: () => [1,2,3,4,5]
-                });
-                // fake languages
-                Object.defineProperty(navigator, 'languages', {
-                  get: () => ['en-US','en']
-                });
-            """)
-
-			page = context.new_page()
-			output = callback(page)
-			browser.close()
-
-			return output
+		saved = self.storage.load(BASE_URL) if self.storage is not None else None
+		if saved is not None and saved.device in DEVICES:
+			device = saved.device
+			options = {"storage_state": saved.state}
+			self.logger.debug(f"Reusing storage state saved with {device}.")
+		else:
+			saved = None
+			device = choice(DEVICES)
+			options = {}
+
+		async with self.throttle.track(BASE_URL) as lease, self.pool.page(
+			device=device,
+			init_script=STEALTH_SCRIPT,
+			blocker=self.blocker,
+			locale="en-US",
+			timezone_id="Europe/Budapest",
+			extra_http_headers={
+			  "accept-language": "en-US,en;q=0.9"
+			},
+			**options,
+		) as page:
+			try:
+				events, blocked = await callback(page, saved is not None)
+			except Exception:
+				# A stale state can lead to a challenge page instead of the list
+				if saved is not None:
+					self.storage.invalidate(BASE_URL)
+				raise
+			if blocked:
+				lease.outcome = BLOCKED
+			if self.storage is not None:
+				if blocked:
+					self.storage.invalidate(BASE_URL)
+				else:
+					self.storage.save(BASE_URL, await page.context.storage_state(), device)
+			return events
 	
-	def __scrape_site(self, url: str, timeout: int):
+	async def __scrape_site(self, url: str, timeout: int):
 		"""
 		General scraping functionality.
 		Since the site's pages are generally the same
 		we can use this function on every page.
 		"""
-		def callback(page) -> List[Event]:
+		async def callback(page, warm: bool) -> Tuple[List[Event], bool]:
 			self.logger.info(f"Started scraping {url}. Timeout is set to {timeout/1_000}s.")
-			page.goto(url, timeout=timeout, wait_until="domcontentloaded")
+
+			# Collect the list's API responses from the start
+			captured = []
+			async def on_response(response):
+				if (
+					API_URL_PATTERN in response.url
+					and response.request.resource_type in ("xhr", "fetch")
+				):
+					try:
+						captured.append((response.request, await response.json()))
+					except Exception:
+						pass
+			if self.mode == "api":
+				page.on("response", on_response)
+
+			await page.goto(url, timeout=timeout, wait_until="domcontentloaded")
 
 			# Wait for the events to show
 			EVENTS_WRAPPER = "div:has(h2:has-text('Events'))"
-			page.wait_for_selector(EVENTS_WRAPPER, timeout=timeout)
+			await page.wait_for_selector(EVENTS_WRAPPER, timeout=timeout)
 
-			# Close cookie banner
+			# Close cookie banner, a restored state has usually answered it
 			COOKIE_BANNER = "button:has-text('Reject')"
-			page.locator(COOKIE_BANNER).click()
+			banner = page.locator(COOKIE_BANNER)
+			if not warm or await banner.count():
+				await banner.click()
 
-			# Press 'Show more' while it is visible
-			SHOW_MORE = "button:has-text('Show more')"
-			buttons = page.locator(SHOW_MORE)
-			while buttons.count() == 2:
-				self.logger.debug("Pressing 'Show more' button.")
-				try:
-					more = buttons.first
-					more.wait_for(state="visible", timeout=3_000)
-					more.scroll_into_view_if_needed()
-					more.click(timeout=5_000)
-					page.wait_for_timeout(1_000)
-				except Exception as error:
-					self.logger.error(f"Could not click 'Show more' button. Error: {error}.")
-					break
-
-				# Re-query DOM
-				buttons = page.locator(SHOW_MORE)
+			if self.mode == "api":
+				# Check if got suspended before reading anything
+				if await self.__blocked(page):
+					self.logger.warning(f"Anti-bot enabled. Could not scrape {url}")
+					return [], True
+
+				result = await self.__scrape_api(page, captured)
+				page.remove_listener("response", on_response)
+				if result is not None:
+					events, blocked = result
+					if blocked:
+						self.logger.warning(f"Anti-bot enabled while paging {url}; got {len(events)} events only.")
+					else:
+						self.logger.info(f"Scraped {len(events)} events.")
+					return events, blocked
+				self.logger.warning("No paginated API response seen, falling back to the DOM.")
+
+			await self.__show_more(page)
 			
 			# Check if got suspended
-			page.wait_for_timeout(1_000)
-			error_locator = page.locator("text=/Something went wrong.*Please contact us if this keeps happening/i")
-			if error_locator.count():
+			if await self.__blocked(page):
 				self.logger.warning(f"Anti-bot enabled. Could not scrape {url}")
-				return []
+				return [], True
 			
-			# Scrape events
-			CARD = "a[href*='/event/']"
-			elements = page.query_selector_all(CARD)
-			self.logger.info(f"Identified {len(elements)} events to be scraped.")
-
-			events = []
-			for _, element in enumerate(elements, start=1):
-				name = element.query_selector("h4").inner_text().strip()
-				place_link = element.query_selector("h5").inner_text().strip()
-				ticketswap_url = element.get_attribute("href")
-				date = element.query_selector(
-					"div:has(svg[aria-label='CalendarAlt']) span"
-				).inner_text().strip()
-
-				event = Event(
-					name,
-					placeLinks= ["TODO"],
-					URLs = URLs(
-						ticketswapURL = ticketswap_url
-					)
-				);
-
-				events.append(event)
+			# Scrape events, every field of every card in one evaluation
+			cards = await page.eval_on_selector_all(CARD, EXTRACT_CARDS_SCRIPT)
+			self.logger.info(f"Identified {len(cards)} events to be scraped.")
+
+			events = [event for event in map(card_to_event, cards) if event is not None]
 
 			self.logger.info(f"Scraped {len(events)} events.")
-			return events
+			return events, False
 		
-		return self.__scrape(callback)
+		return await self.__scrape(callback)
+
+	async def __blocked(self, page) -> bool:
+		"""
+		Whether the page shows the anti-bot error instead of the list.
+		"""
+		await page.wait_for_timeout(1_000)
+		error_locator = page.locator("text=/Something went wrong.*Please contact us if this keeps happening/i")
+		return bool(await error_locator.count())
+
+	async def __show_more(self, page):
+		"""
+		Press 'Show more' while it is visible.
+		"""
+		buttons = page.locator(SHOW_MORE)
+		while await buttons.count() == 2:
+			self.logger.debug("Pressing 'Show more' button.")
+			try:
+				more = buttons.first
+				await more.wait_for(state="visible", timeout=3_000)
+				await more.scroll_into_view_if_needed()
+				await more.click(timeout=5_000)
+				await page.wait_for_timeout(1_000)
+			except Exception as error:
+				self.logger.error(f"Could not click 'Show more' button. Error: {error}.")
+				break
+
+			# Re-query DOM
+			buttons = page.locator(SHOW_MORE)
 
-	def scrape_event(self, url: str, timeout=60_000):
+	async def __scrape_api(self, page, captured) -> Optional[Tuple[List[Event], bool]]:
+		"""
+		Page through the events list by replaying its API request.
+		The first page is server rendered, so it is read from the DOM.
+		Returns (events, blocked by anti-bot), or None if no paginated
+		response was captured.
+		"""
+		if not any(True for _, payload in captured for _ in _connections(payload)):
+			# Let one click trigger the request behind 'Show more'
+			try:
+				async with page.expect_response(
+					lambda response: API_URL_PATTERN in response.url, timeout=5_000
+				) as response_info:
+					await page.locator(SHOW_MORE).first.click(timeout=5_000)
+				response = await response_info.value
+				captured.append((response.request, await response.json()))
+			except Exception as error:
+				self.logger.debug(f"No API response after 'Show more': {error}")
+
+		# (request, pageInfo, index of the entry in a batched request or None)
+		source = None
+		events = {}
+		for request, payload in captured:
+			entries = enumerate(payload) if isinstance(payload, list) else [(None, payload)]
+			for index, entry in entries:
+				for nodes, page_info in _connections(entry):
+					found = [event for event in map(node_to_event, nodes) if event is not None]
+					if found:
+						source = (request, page_info, index)
+						for event in found:
+							events.setdefault(event.URLs.ticketswapURL, event)
+		if source is None:
+			return None
+
+		cards = await page.eval_on_selector_all(CARD, EXTRACT_CARDS_SCRIPT)
+		for event in map(card_to_event, cards):
+			if event is not None:
+				events.setdefault(event.URLs.ticketswapURL, event)
+
+		request, page_info, index = source
+		headers = {
+			key: value for key, value in request.headers.items()
+			if not key.startswith(":") and key.lower() not in ("content-length", "host", "cookie")
+		}
+		pages = 0
+		while page_info.get("hasNextPage") and page_info.get("endCursor") and pages < self.max_api_pages:
+			pages += 1
+			cursor = page_info["endCursor"]
+			if request.method == "POST":
+				body = request.post_data_json
+				# Of a batch, re-issue only the operation holding the list
+				batched = isinstance(body, list)
+				body = dict(body[index or 0] if batched else body)
+				body["variables"], found = _with_cursor(body.get("variables") or {}, cursor)
+				if not found:
+					body["variables"]["after"] = cursor
+				response = await page.request.post(
+					request.url, data=json.dumps([body] if batched else body), headers=headers
+				)
+			else:
+				parsed = urlparse(request.url)
+				query = dict(parse_qsl(parsed.query))
+				variables, found = _with_cursor(json.loads(query.get("variables") or "{}"), cursor)
+				if not found:
+					variables["after"] = cursor
+				query["variables"] = json.dumps(variables)
+				response = await page.request.get(
+					parsed._replace(query=urlencode(query)).geturl(), headers=headers
+				)
+
+			if response.status in (403, 429):
+				self.logger.warning(f"API page {pages} refused with status {response.status}.")
+				return list(events.values()), True
+			if not response.ok:
+				self.logger.warning(f"API page {pages} failed with status {response.status}.")
+				break
+			payload = await response.json()
+
+			page_info = {}
+			for nodes, info in _connections(payload):
+				found = [event for event in map(node_to_event, nodes) if event is not None]
+				if found:
+					page_info = info
+					for event in found:
+						events.setdefault(event.URLs.ticketswapURL, event)
+
+		self.logger.info(f"Read {pages} API pages after the first one.")
+		return list(events.values()), False
+
+	async def scrape_event(self, url: str, timeout=60_000):
 		"""
 		Function to scrape data from the event page.
 		"""
-		return self.__scrape_site(url, timeout)
+		return await self.__scrape_site(url, timeout)
 			
-	def scrape_venue(self, url: str, timeout=60_000):
+	async def scrape_venue(self, url: str, timeout=60_000):
 		"""
 		Function to scrape data from the venue page.
 		"""
-		return self.__scrape_site(url, timeout)
+		return await self.__scrape_site(url, timeout)
 	
-	def scrape_city(self, url: str, timeout=60_000):
+	async def scrape_city(self, url: str, timeout=60_000):
 		"""
 		Function to scrape data from the city page.
 		"""
-		return self.__scrape_site(url, timeout)
+		return await self.__scrape_site(url, timeout)
 		
 
 if __name__ == "__main__":
-	# Example usage
-	logger = CustomLogger("Example")
-	connector = TicketSwapConnector(headless=False)
-	data = connector("https://www.ticketswap.com/location/akvarium-klub/13262")
-	logger.info(data)
\ No newline at end of file
+	async def main():
+		# Example usage
+		logger = CustomLogger("Example")
+		connector = TicketSwapConnector(headless=False)
+		data = await connector("https://www.ticketswap.com/location/akvarium-klub/13262")
+		logger.info(data)
+		await connector.close()
+
+	asyncio.run(main())
\ No newline at end of file
@@ -1,13 +1,143 @@
 import re
+import time
 from os import getenv
 from psycopg2 import sql
 from datetime import date
 from unidecode import unidecode
-from modules.db import connect_to_db
+from modules.db import ConnectionPool
+from modules.entity_index import EntityIndex
+from modules.fuzzy_matcher import FuzzyMatcher
 from modules.pdf import Title, Data, PDFData
 from tixa_scraper.modules.tixa_connector import TixaConnector
 from modules.custom_logger import CustomLogger
 
+"""
+Query matching a batch of scraped (name, tixa_url) pairs against one
+entity table in a single round-trip. Per scraped pair (by its 1-based
+position) it returns the best row: one whose tixa_url equals the scraped
+url, otherwise one with the same name and no tixa_url.
+"""
+MATCH_QUERY = sql.SQL("""
+    WITH scraped AS (
+        SELECT s.ord, s.name, s.tixa_url
+        FROM unnest(%(names)s::text[], %(urls)s::text[])
+            WITH ORDINALITY AS s(name, tixa_url, ord)
+    ), matches AS (
+        -- tixa_url match: success
+        SELECT s.ord, entity.id, entity.name, url.tixa_url
+        FROM scraped s
+        JOIN urls url ON url.tixa_url = s.tixa_url
+        JOIN {table} entity ON entity.id = url.{fk}
+        UNION ALL
+        -- name match without tixa_url: partial success
+        SELECT s.ord, entity.id, entity.name, url.tixa_url
+        FROM scraped s
+        JOIN {table} entity ON entity.name = s.name
+        JOIN urls url ON url.{fk} = entity.id
+        WHERE url.tixa_url IS NULL
+    )
+    SELECT DISTINCT ON (ord) ord, id, name, tixa_url IS NOT NULL
+    FROM matches
+    ORDER BY ord, tixa_url IS NULL, id;
+""")
+
+"""
+Query returning, per scraped name (by its 1-based position), the k rows
+of an entity table most similar to it by pg_trgm similarity that are not
+linked to any tixa_url. `%` uses the GIN trigram index on name
+(init/main_db/001_name_trgm_indexes.sql); its cutoff is the
+pg_trgm.similarity_threshold setting.
+"""
+SIMILAR_QUERY = sql.SQL("""
+    SELECT s.ord, similar.id, similar.name, similar.score
+    FROM unnest(%(names)s::text[]) WITH ORDINALITY AS s(name, ord)
+    CROSS JOIN LATERAL (
+        SELECT entity.id, entity.name, similarity(entity.name, s.name) AS score
+        FROM {table} entity
+        WHERE entity.name %% s.name
+            AND EXISTS (
+                SELECT 1 FROM urls url
+                WHERE url.{fk} = entity.id AND url.tixa_url IS NULL
+            )
+        ORDER BY score DESC, entity.id
+        LIMIT %(k)s
+    ) similar
+    ORDER BY s.ord, similar.score DESC, similar.id;
+""")
+
+def describe_similar(candidates) -> str:
+    """
+    "name: score, ..." of (name, score) candidates, best first.
+    """
+    return ", ".join(f"{name}: {score:.2f}" for name, score in candidates)
+
+def match_batch(cursor, table: str, fk: str, pairs: list[list]) -> dict[int, tuple]:
+    """
+    Match [name, tixa_url] pairs against table (joined to urls on fk).
+    Returns {index in pairs: (id, name, exact)} for the matched ones,
+    exact meaning the row is linked to the scraped tixa_url.
+    """
+    if not pairs:
+        return {}
+    query = MATCH_QUERY.format(table=sql.Identifier(table), fk=sql.Identifier(fk))
+    cursor.execute(query, {
+        "names": [name for name, _ in pairs],
+        "urls": [tixa_url for _, tixa_url in pairs],
+    })
+    return {ord - 1: (id, name, exact) for ord, id, name, exact in cursor.fetchall()}
+
+def match_index(index: EntityIndex, pairs: list[list]) -> dict[int, tuple]:
+    """
+    match_batch's result shape from an in-memory EntityIndex. Like
+    MATCH_QUERY, name matches need a urls row without tixa_url; unlike
+    it, names differing only in accents, case or suffixes also match, so
+    some rows failing in "sql" mode are partial successes here.
+    """
+    matches = {}
+    for i, (name, tixa_url) in enumerate(pairs):
+        entity, exact = index.match(name, tixa_url)
+        if entity is not None:
+            matches[i] = (entity.id, entity.name, exact)
+    return matches
+
+def match_trgm(cursor, table: str, fk: str, pairs: list[list], k: int = 3, threshold: float = 0.5) -> dict[int, tuple]:
+    """
+    match_batch, then for the pairs left unmatched the k most similar
+    unlinked rows by pg_trgm, all in one query. Like match_fuzzy, their
+    name is given as "name: score, ...".
+    """
+    matches = match_batch(cursor, table, fk, pairs)
+    unmatched = [i for i in range(len(pairs)) if i not in matches]
+    if not unmatched:
+        return matches
+
+    # Local to the report's transaction.
+    cursor.execute("SELECT set_config('pg_trgm.similarity_threshold', %s, true)", (str(threshold),))
+    query = SIMILAR_QUERY.format(table=sql.Identifier(table), fk=sql.Identifier(fk))
+    cursor.execute(query, {"names": [pairs[i][0] for i in unmatched], "k": k})
+
+    similar = {}
+    for ord, id, name, score in cursor.fetchall():
+        similar.setdefault(unmatched[ord - 1], []).append((id, name, score))
+    for i, candidates in similar.items():
+        matches[i] = (candidates[0][0], describe_similar((name, score) for _, name, score in candidates), False)
+    return matches
+
+def match_fuzzy(index: EntityIndex, matcher: FuzzyMatcher, pairs: list[list], k: int = 3) -> dict[int, tuple]:
+    """
+    match_index, then for the pairs left unmatched the k most similar
+    unlinked names; their name is given as "name: score, ..." so the
+    report's "similar name" description lists them.
+    """
+    matches = match_index(index, pairs)
+    for i, (name, _) in enumerate(pairs):
+        if i in matches:
+            continue
+        candidates = matcher.search(name, k=k)
+        if candidates:
+            matches[i] = (candidates[0].id, describe_similar((c.name, c.score) for c in candidates), False)
+    return matches
+
 """
 Class to make riports about tixa.hu data.
 """
@@ -15,13 +145,50 @@ class TixaConnector:
     def __init__(self, DB_CONFIG):
         self.logger = CustomLogger("TixaConnector")
         self.DB_CONFIG = DB_CONFIG
+        # Reused by every report instead of connecting each time
+        self.pool = ConnectionPool(**DB_CONFIG, minconn=1, maxconn=2)
+        # table -> EntityIndex, kept between reports and refreshed
+        self.indexes = {}
+        # table -> FuzzyMatcher of the index's unlinked entities
+        self.fuzzy = {}
     """
     Function to make a report about the data of tixa.hu.
+    match_mode: "sql" matches in the database, "index" in memory
+                with an EntityIndex per table, "fuzzy" like "index"
+                but lists similar names for the unmatched ones, "trgm"
+                like "sql" with the similar names found by pg_trgm.
+    fuzzy_threshold: lowest trigram similarity listed in "fuzzy" and
+                     "trgm" mode.
     """
-    def make_report(self, filename:str="output.pdf", show_success:bool=False):
-        # Making conenction to the db.
-        connection = connect_to_db(**DB_CONFIG)
-        cursor = connection.cursor()
+    def make_report(self, filename:str="output.pdf", show_success:bool=False, match_mode:str="sql", fuzzy_threshold:float=0.5):
+        if match_mode not in ("sql", "index", "fuzzy", "trgm"):
+            raise ValueError(f"Unknown match_mode: {match_mode!r} (expected 'sql', 'index', 'fuzzy' or 'trgm').")
+
+        """
+        Function to match scraped [name, tixa_url] pairs in the chosen mode.
+        """
+        def match(table: str, fk: str, pairs: list[list]) -> dict[int, tuple]:
+            if match_mode == "sql":
+                return match_batch(cursor, table, fk, pairs)
+            if match_mode == "trgm":
+                return match_trgm(cursor, table, fk, pairs, threshold=fuzzy_threshold)
+            index = self.indexes.get(table)
+            if index is None:
+                index = self.indexes[table] = EntityIndex(connection, table, fk, "tixa_url")
+                changed = True
+            else:
+                index.connection = connection
+                changed = index.refresh() > 0
+            if match_mode == "index":
+                return match_index(index, pairs)
+
+            matcher = self.fuzzy.get(table)
+            if matcher is None or changed or matcher.threshold != fuzzy_threshold:
+                matcher = self.fuzzy[table] = FuzzyMatcher(
+                    ((e.id, e.name) for e in index.entities() if e.unlinked),
+                    threshold=fuzzy_threshold,
+                )
+            return match_fuzzy(index, matcher, pairs)
 
         self.logger.info("Scraping tixa.hu...")
         result = scrape()   # Example return: [
@@ -64,34 +231,27 @@ class TixaConnector:
         def eval_places() -> list[Data]:
             scraped_places = places()
 
+            start = time.perf_counter()
+            matches = match("places", "place_id", scraped_places)
+            self.logger.info(f"Matched {len(scraped_places)} places in {time.perf_counter() - start:.2f}s.")
+
             serialized = []
-            for place in scraped_places:
+            for i, place in enumerate(scraped_places):
                 place_name, place_tixa_url = place
 
-                query = sql.SQL("""
-                                SELECT place.id, place.name, url.tixa_url
-                                FROM urls url
-                                JOIN places place ON place.id = url.place_id
-                                WHERE url.tixa_url = %s OR place.name LIKE %s;
-                            """)
-
-                cursor.execute(query, (place_tixa_url, place_name))
-                rows = cursor.fetchall()
-
                 status = "fail"
                 description = "A helyszin nem talalhato az adatbazisban."
                 link = place_tixa_url
-                for row in rows:
-                    id, name, tixa_url = row
+                if i in matches:
+                    id, name, exact = matches[i]
 
                     # tixa_url match: success
-                    if tixa_url == place_tixa_url: 
+                    if exact: 
                         status = "success"
                         description = "Letezik az adatbazisban."
                         link = f"https://www.tivornya.hu/P/{id}"
-                        break
                     # name match: partial success
-                    elif tixa_url is None: 
+                    else: 
                         status = "normal"
                         description = f"Letezik helyszin hasonlo nevvel ({name}). Nincs tixa_url-el osszekotve."
                         link = place_tixa_url #f"https://www.tivornya.hu/P/{id}"
@@ -127,36 +287,29 @@ class TixaConnector:
         def eval_events() -> list[Data]:
             scraped_events = events()
 
+            start = time.perf_counter()
+            matches = match("events", "event_id", scraped_events)
+            self.logger.info(f"Matched {len(scraped_events)} events in {time.perf_counter() - start:.2f}s.")
+
             serialized = []
-            for event in scraped_events:
+            for i, event in enumerate(scraped_events):
                 event_name, event_tixa_url = event
 
-                query = sql.SQL("""
-                                SELECT event.id, event.name, url.tixa_url
-                                FROM urls url
-                                JOIN events event ON event.id = url.event_id
-                                WHERE url.tixa_url = %s OR event.name LIKE %s;
-                            """)
-
-                cursor.execute(query, (event_tixa_url, event_name))
-                rows = cursor.fetchall()
-
                 status = "fail"
                 description = "Az esemény nem talalhato az adatbazisban."
                 link = event_tixa_url
                 # link = f"https://www.facebook.com/search/events/?q={event_name}"
-                for row in rows:
-                    id, name, tixa_url = row
+                if i in matches:
+                    id, name, exact = matches[i]
 
                     # tixa_url match: success
-                    if tixa_url == event_tixa_url: 
+                    if exact: 
                         status = "success"
                         description = "Letezik az adatbazisban."
                         link = f"https://www.tivornya.hu/E/{id}"
                         # link = f"https://www.facebook.com/search/events/?q={event_name}"
-                        break
                     # name match: partial success
-                    elif tixa_url is None: 
+                    else: 
                         status = "normal"
                         description = f"Letezik esemény hasonlo nevvel ({name}). Nincs tixa_url-el osszekotve."
                         link = f"https://www.tivornya.hu/E/{id}"
@@ -174,12 +327,14 @@ class TixaConnector:
             serialized.sort(key=lambda p: p.status)
             return serialized
 
-        pdf_data = [
-            Title("Helyszínek"), 
-            *eval_places(),
-            Title("Események"),
-            *eval_events()
-        ]
+        # Borrowing a connection for the matching (used by match).
+        with self.pool.connection() as connection, connection.cursor() as cursor:
+            pdf_data = [
+                Title("Helyszínek"), 
+                *eval_places(),
+                Title("Események"),
+                *eval_events()
+            ]
 
         # event_in_database() + place_not_in_databese ()
         pdf = PDFData("Tixa Riport", date.today())
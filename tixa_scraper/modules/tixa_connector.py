@@ -1,13 +1,78 @@
-from urllib.parse import urlparse
-from playwright.async_api import async_playwright
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import urljoin, urlparse
 import asyncio
 import re
+import requests
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from modules.adaptive_throttle import AdaptiveThrottle
+from modules.browser_pool import BrowserPool
+from modules.custom_fetcher import AsyncCustomFetcher, CircuitOpenError, RobotsError
 from modules.custom_logger import CustomLogger
+from modules.html_extractor import PageData, extract
+from modules.request_blocker import RequestBlocker
+
+# schema.org types read from JSON-LD
+EVENT_TYPES = ("Event", "MusicEvent", "Festival", "TheaterEvent", "ComedyEvent", "DanceEvent", "SocialEvent")
+
+MONTHS = (
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+)
+
+def display_date(value: str) -> str:
+    """
+    Tixa's display form ("FULL MONTH DAY, YYYY HH:MM") of an ISO 8601
+    date or datetime; other values are returned unchanged.
+    """
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return value
+    text = f"{MONTHS[parsed.month - 1]} {parsed.day}, {parsed.year}"
+    if "T" in value or " " in value.strip():
+        text += f" {parsed.hour:02d}:{parsed.minute:02d}"
+    return text
 
 class TixaConnector:
-    def __init__(self, headless=True):
+    def __init__(
+        self,
+        headless=True,
+        pool: Optional[BrowserPool] = None,
+        concurrency=4,
+        blocker: Optional[RequestBlocker] = None,
+        fetcher: Optional[AsyncCustomFetcher] = None,
+        http_first=True,
+        throttle: Optional[AdaptiveThrottle] = None,
+    ):
+        """
+        pool: shared BrowserPool, a private one is made if not given.
+        concurrency: number of event pages scraped at once from the mainpage.
+        blocker: request filter, by default images, media, fonts,
+                 stylesheets and trackers are not loaded.
+        fetcher: used for the HTTP-first path, a private one is made if not given.
+        http_first: try to read event pages from their HTML before
+                    rendering them; Playwright is only used when a
+                    required field is missing.
+        throttle: adaptive per-origin pace of the browser and HTTP paths,
+                  shared with the private fetcher (pass the same one to
+                  a given fetcher); a private one is made if not given.
+        """
         self.logger = CustomLogger("TixaConnector")
         self.headless = headless
+        self.concurrency = max(1, concurrency)
+        self.blocker = blocker if blocker is not None else RequestBlocker()
+        self.pool = pool if pool is not None else BrowserPool(
+            size=1, pages_per_browser=self.concurrency, headless=headless
+        )
+        self._owns_pool = pool is None
+        self.http_first = http_first
+        self.throttle = throttle if throttle is not None else AdaptiveThrottle()
+        self.fetcher = fetcher if fetcher is not None else AsyncCustomFetcher(throttle=self.throttle)
+        self._owns_fetcher = fetcher is None
+        # Pages served by each path ("http" or "browser")
+        self.path_hits = Counter()
 
     async def __call__(self, url: str):
         """
@@ -25,24 +90,183 @@ class TixaConnector:
             self.logger.info("Using event scraping method.")
             return await self.scrape_event(parsed_url._replace(fragment="").geturl())
 
-    async def _scroll(self, page, max_iteration=25, wait=2):
+    async def close(self):
+        """
+        Close the browser pool and the fetcher if this connector made them.
+        """
+        self.logger.info(f"Scraping paths: {self.path_stats()}")
+        self.logger.info(f"Throttle limits: {self.throttle.snapshot()}")
+        if self._owns_pool:
+            await self.pool.close()
+        if self._owns_fetcher:
+            self.fetcher.close()
+
+    def path_stats(self) -> Dict[str, float]:
+        """
+        Pages served over plain HTTP and by the browser, with the HTTP hit rate.
+        """
+        total = self.path_hits["http"] + self.path_hits["browser"]
+        return {
+            "http": self.path_hits["http"],
+            "browser": self.path_hits["browser"],
+            "http_rate": self.path_hits["http"] / total if total else 0.0,
+        }
+
+    async def _scroll(self, page, max_iteration=25, wait=2, settle=0.5, deadline=60):
         """
         Function to scroll down to the bottom of the page.
+        After each scroll it waits until the page grows instead of sleeping:
+        if it did not grow within `settle` seconds and no XHR/fetch request
+        is in flight the list is complete, otherwise it waits up to `wait`
+        seconds for the pending requests to render. Stops after `deadline`
+        seconds overall.
         """
-        previous_height = None
-        for _ in range(max_iteration):
-            current_height = await page.evaluate("document.body.scrollHeight")
-            if previous_height == current_height:
-                break
-            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
-            previous_height = current_height
-            await asyncio.sleep(wait)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        pending = set()
+
+        def _started(request):
+            if request.resource_type in ("xhr", "fetch"):
+                pending.add(request)
+
+        def _finished(request):
+            pending.discard(request)
+
+        page.on("request", _started)
+        page.on("requestfinished", _finished)
+        page.on("requestfailed", _finished)
+
+        iterations = 0
+        try:
+            for _ in range(max_iteration):
+                remaining = deadline - (loop.time() - start)
+                if remaining <= 0:
+                    self.logger.warning(f"Scrolling stopped at the {deadline}s deadline.")
+                    break
+
+                height = await page.evaluate("document.body.scrollHeight")
+                await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                iterations += 1
+
+                grew = await self._wait_for_growth(page, height, min(settle, remaining))
+                if not grew and pending:
+                    remaining = deadline - (loop.time() - start)
+                    grew = await self._wait_for_growth(page, height, min(wait, remaining))
+                if not grew:
+                    break
+        finally:
+            page.remove_listener("request", _started)
+            page.remove_listener("requestfinished", _finished)
+            page.remove_listener("requestfailed", _finished)
+
+        # The fixed-sleep version slept `wait` seconds after every scroll.
+        elapsed = loop.time() - start
+        fixed = iterations * wait
+        self.logger.info(
+            f"Scrolled {iterations} times in {elapsed:.1f}s "
+            f"(fixed sleeps: {fixed:.1f}s, saved {max(0.0, fixed - elapsed):.1f}s)."
+        )
+
+    async def _wait_for_growth(self, page, height, timeout):
+        """
+        Wait up to `timeout` seconds for the page to grow past `height`.
+        """
+        if timeout <= 0:
+            return False
+        try:
+            await page.wait_for_function(
+                "height => document.body.scrollHeight > height",
+                arg=height,
+                timeout=timeout * 1000,
+            )
+            return True
+        except PlaywrightTimeoutError:
+            return False
 
     async def _scrape_event(self, url: str, timeout: int):
+        if self.http_first:
+            events = await self._scrape_event_http(url, timeout)
+            if events:
+                self.path_hits["http"] += 1
+                return events
+        self.path_hits["browser"] += 1
+        return await self._scrape_event_browser(url, timeout)
+
+    async def _scrape_event_http(self, url: str, timeout: int) -> List[dict]:
+        """
+        Read the events from the server-rendered HTML.
+        Returns [] if the page has to be rendered.
+        """
+        try:
+            response = await self.fetcher.fetch(url, timeout=timeout / 1000)
+            response.raise_for_status()
+        except (requests.RequestException, RobotsError, CircuitOpenError) as error:
+            self.logger.debug(f"HTTP path failed for {url}: {error}")
+            return []
+        events = self._events_from_html(extract(response.text), url)
+        if not events:
+            self.logger.debug(f"Required fields missing from the HTML of {url}.")
+        return events
+
+    def _events_from_html(self, page: PageData, url: str) -> List[dict]:
+        """
+        Same fields as the browser path, from knockout markup that is
+        already filled in, or else from JSON-LD (its ISO 8601 dates are
+        converted with display_date).
+        """
+        #Just an event
+        location = [e for e in page.find(bind="locationName") if e.text]
+        title = page.texts(bind="title")
+        date = page.texts(bind="startDate")
+        if location and title and date:
+            return [{
+                "title": title[0],
+                "venue": location[0].text,
+                "venue_url": location[0].attrs.get("href"),
+                "date": date[0],
+                "tixa_url": url,
+            }]
+
+        #A place with events
+        titles = [e for e in page.find(bind="text: data.name") if e.text]
+        locations = page.texts(bind_exact="text: data.location.name")
+        dates = page.texts(bind_exact="text: data.customDate || data.startDate")
+        if titles and len(titles) == len(locations) == len(dates):
+            return [{
+                "title": title.text,
+                "venue": location,
+                "venue_url": url,
+                "date": date,
+                "tixa_url": title.attrs.get("href"),
+            } for title, location, date in zip(titles, locations, dates)]
+
         events = []
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=self.headless)
-            page = await browser.new_page()
+        items = page.json_ld_of_type(*EVENT_TYPES)
+        for item in items:
+            location = item.get("location")
+            if isinstance(location, list):
+                location = location[0] if location else None
+            if not isinstance(location, dict):
+                return []
+            if not (item.get("name") and item.get("startDate") and location.get("name")):
+                return []
+            if len(items) == 1:
+                venue_url, tixa_url = location.get("url"), url
+            else:
+                venue_url = url
+                tixa_url = urljoin(url, item["url"]) if item.get("url") else None
+            events.append({
+                "title": item["name"],
+                "venue": location["name"],
+                "venue_url": venue_url,
+                "date": display_date(item["startDate"]),
+                "tixa_url": tixa_url,
+            })
+        return events
+
+    async def _scrape_event_browser(self, url: str, timeout: int):
+        events = []
+        async with self.throttle.track(url), self.pool.page(blocker=self.blocker) as page:
             await page.goto(url, timeout=timeout)
 
             #Scraping for if it is just an event
@@ -84,33 +308,66 @@ class TixaConnector:
                     "date": await event_dates[i].inner_text(),
                     "tixa_url": await event_titles[i].get_attribute('href'),
                 })
-
-            await browser.close()
         return events
 
-    async def _scrape_mainpage(self, url: str, timeout: int):
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=self.headless)
-            page = await browser.new_page()
-
+    async def _mainpage_links(self, url: str, timeout: int) -> List[str]:
+        """
+        Collect the distinct event links listed on the mainpage.
+        """
+        async with self.throttle.track(url), self.pool.page(blocker=self.blocker) as page:
             self.logger.info(f"Started scraping {url}. Timeout is set to {timeout/1000}s.")
             await page.goto(url, timeout=timeout)
             await self._scroll(page)
 
             name_elements = await page.locator('[data-bind="text: data.name, attr: { href: data.url }"]').all()
 
+            links = []
             for elem in name_elements:
                 link = await elem.get_attribute("href")
                 if link:
-                    await self.__call__(link)
+                    links.append(urljoin(url, link))
+        # Keep the first occurrence of every link
+        links = list(dict.fromkeys(links))
+        self.logger.info(f"Found {len(links)} events on {url}.")
+        return links
+
+    async def _scrape_mainpage(self, url: str, timeout: int):
+        """
+        Scrape every event linked from the mainpage, at most
+        self.concurrency pages at once, yielding each page's events
+        as soon as it is done.
+        """
+        links = await self._mainpage_links(url, timeout)
+        semaphore = asyncio.Semaphore(self.concurrency)
 
-            await browser.close()
+        async def _scrape(link):
+            async with semaphore:
+                try:
+                    return await self._scrape_event(link, timeout)
+                except Exception as error:
+                    self.logger.error(f"Could not scrape {link}. Error: {error}.")
+                    return []
+
+        for task in asyncio.as_completed([_scrape(link) for link in links]):
+            yield await task
+
+    async def iter_mainpage(self, url: str, timeout=60_000):
+        """
+        Stream the events of the mainpage, one scraped page at a time.
+        """
+        async for events in self._scrape_mainpage(url, timeout):
+            yield events
 
     async def mainpage(self, url: str, timeout=60_000):
         """
         Function to scrape data from the mainpage.
+        Returns the merged event list of every linked page.
         """
-        return await self._scrape_mainpage(url, timeout)
+        events = []
+        async for page_events in self._scrape_mainpage(url, timeout):
+            events.extend(page_events)
+        self.logger.info(f"Scraped {len(events)} events from {url}.")
+        return events
 
     async def scrape_event(self, url: str, timeout=60_000):
         """
@@ -127,5 +384,6 @@ if __name__ == "__main__":
         #url = "https://www.tixa.hu/durerkert" 
         data = await connector(url)
         logger.info(data)
+        await connector.close()
 
     asyncio.run(main())